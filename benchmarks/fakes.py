@@ -0,0 +1,49 @@
+"""Fakes for the offline benchmarks: a Bot that never leaves the process and
+a MemoryClient with injected round-trip latency."""
+import asyncio
+import itertools
+from collections import Counter
+
+from telegram.ext import ExtBot
+
+from tools.fake_telegram import api_result
+from utils.local_client import MemoryClient
+
+
+class FakeBot(ExtBot):
+    """ExtBot whose Bot API calls are answered locally after `latency` seconds"""
+
+    def __init__(self, latency: float = 0.0, token: str = "123:fake"):
+        super().__init__(token)
+        # Bot instances are frozen once initialised
+        with self._unfrozen():
+            self.latency = latency
+            self.calls = Counter()
+            self._message_ids = itertools.count(1)
+
+    async def _do_post(self, endpoint, data, **kwargs):
+        self.calls[endpoint] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return api_result(endpoint, data, next(self._message_ids))
+
+
+class LatencyClient(MemoryClient):
+    """MemoryClient that sleeps `latency` seconds per request (a PostgREST round trip)"""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.round_trips = 0
+
+    async def run(self, query):
+        self.round_trips += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return await super().run(query)
+
+    async def call(self, fn, params):
+        self.round_trips += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return await super().call(fn, params)
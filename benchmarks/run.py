@@ -0,0 +1,246 @@
+"""Offline handler benchmarks - fake Bot, in-memory database with injected latency
+
+    python -m benchmarks.run                          # all scenarios, JSON on stdout
+    python -m benchmarks.run --db-latency-ms 20 --ops 300 --out bench.json
+    python -m benchmarks.run --only balance,bonus --compare bench.json
+
+Each scenario drives the real Application from main.build_application()
+(handler wrappers, per-user locks, metrics and all) through process_update.
+Reported per scenario: ops/sec, p50/p99 latency of one operation, database
+round trips and Bot API calls per operation. The JSON output has sorted keys
+and no timestamps, so two runs can be diffed directly (or with --compare).
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from types import SimpleNamespace
+
+# Before the bot modules read their settings
+os.environ.setdefault("BOT_TOKEN", "123:fake")
+os.environ.setdefault("ADMIN_ID", "1")
+os.environ.setdefault("REFERRAL_SECRET", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("LOG_STREAM", "stderr")  # stdout is the JSON report
+os.environ.setdefault("BROADCAST_RATE", "1000000")  # engine overhead, not Telegram's limit
+os.environ.setdefault("BROADCAST_DB_PATH", os.path.join(tempfile.mkdtemp(), "broadcasts.sqlite3"))
+
+from telegram import Update
+
+import main
+from benchmarks.fakes import FakeBot, LatencyClient
+from tools.fake_telegram import message_update, callback_update
+from handlers.broadcast_handler import broadcast_task
+from utils.broadcast_store import broadcast_store
+from utils.referrer_index import ReferrerIndex
+from utils.referral_codes import make_referral_code
+from utils.supabase import db
+
+ADMIN_ID = int(os.environ["ADMIN_ID"])
+REFERRER_ID = 10
+REFERRER_CODE = "REF_10_1000"
+FIRST_USER = 1000
+
+
+def seed_users(client, count: int, balance: float = 0.0, referrals: int = 0, referred: bool = False):
+    """Users FIRST_USER.. plus the referrer; every other one referred when `referred`"""
+    users = [{"user_id": REFERRER_ID, "username": "referrer", "balance": 0.0, "referrals": 0,
+              "referral_code": REFERRER_CODE, "created_at": "2024-01-01"}]
+    history = []
+    for i in range(count):
+        user_id = FIRST_USER + i
+        users.append({"user_id": user_id, "username": f"user{user_id}", "balance": balance,
+                      "referrals": referrals, "referral_code": f"REF_{user_id}_1000",
+                      "created_at": "2024-01-01"})
+        if referred and i % 2 == 0:
+            history.append({"new_user_id": user_id, "referrer_id": REFERRER_ID,
+                            "referral_code": REFERRER_CODE, "created_at": "2024-01-01"})
+    client.load("users", users)
+    client.load("referral_history", history)
+
+
+def web_app_update(update_id: int, user_id: int) -> dict:
+    update = message_update(update_id, user_id, "")
+    message = update["message"]
+    del message["text"]
+    message["web_app_data"] = {"data": json.dumps({"ad_completed": True}), "button_text": "Watch Ads 💰"}
+    return update
+
+
+# Every scenario: seed(client, ops) and op(i) -> the updates of operation i
+SCENARIOS = {
+    "start": (
+        lambda client, ops: seed_users(client, 0),
+        lambda i: [message_update(i, FIRST_USER + i, "/start")],
+    ),
+    "start_referral": (
+        lambda client, ops: seed_users(client, 0),
+        lambda i: [message_update(i, FIRST_USER + i, f"/start {REFERRER_CODE}")],
+    ),
+    "referral_signed": (
+        lambda client, ops: seed_users(client, 0),
+        lambda i: [message_update(i, FIRST_USER + i, f"/start {make_referral_code(REFERRER_ID)}")],
+    ),
+    "web_app_data": (
+        lambda client, ops: seed_users(client, 50, referred=True),
+        lambda i: [web_app_update(i, FIRST_USER + i % 50)],
+    ),
+    "balance": (
+        lambda client, ops: seed_users(client, 50, balance=12.5),
+        lambda i: [message_update(i, FIRST_USER + i % 50, "Balance 💳")],
+    ),
+    "bonus": (
+        lambda client, ops: seed_users(client, ops),
+        lambda i: [message_update(i, FIRST_USER + i, "Bonus 🎁")],
+    ),
+    "refer": (
+        lambda client, ops: seed_users(client, 50),
+        lambda i: [message_update(i, FIRST_USER + i % 50, "Refer and Earn 👥")],
+    ),
+    "withdrawal": (
+        lambda client, ops: seed_users(client, ops, balance=500.0, referrals=12),
+        lambda i: [
+            callback_update(4 * i, FIRST_USER + i, "withdraw"),
+            callback_update(4 * i + 1, FIRST_USER + i, "withdraw_upi"),
+            callback_update(4 * i + 2, FIRST_USER + i, "confirm_withdraw_upi"),
+            message_update(4 * i + 3, FIRST_USER + i, "user@upi"),
+        ],
+    ),
+}
+
+
+def reset_db(latency: float) -> LatencyClient:
+    client = LatencyClient(latency)
+    db.client = client
+    db.user_cache.clear()
+    db.legacy_codes.clear()
+    db.referrers = ReferrerIndex()
+    return client
+
+
+def percentile(sorted_values, q: float):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def result(ops: int, elapsed: float, latencies, round_trips: int, bot_calls: int) -> dict:
+    latencies = sorted(latencies)
+    p50, p99 = percentile(latencies, 0.5), percentile(latencies, 0.99)
+    return {
+        "ops": ops,
+        "ops_per_sec": round(ops / elapsed, 1) if elapsed else None,
+        "p50_ms": round(p50 * 1000, 3) if p50 is not None else None,
+        "p99_ms": round(p99 * 1000, 3) if p99 is not None else None,
+        "round_trips_per_op": round(round_trips / ops, 2) if ops else None,
+        "bot_calls_per_op": round(bot_calls / ops, 2) if ops else None,
+    }
+
+
+async def run_handler(name: str, args) -> dict:
+    seed, op = SCENARIOS[name]
+    client = reset_db(args.db_latency_ms / 1000)
+    seed(client, args.ops)
+    bot = FakeBot(args.bot_latency_ms / 1000)
+    app = main.build_application(None, bot=bot)
+    await app.initialize()
+    setup_calls = sum(bot.calls.values())
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+
+    async def run_op(i):
+        async with semaphore:
+            started = time.perf_counter()
+            for data in op(i):
+                await app.process_update(Update.de_json(data, bot))
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_op(i) for i in range(args.ops)))
+    elapsed = time.perf_counter() - started
+    await app.shutdown()
+    return result(args.ops, elapsed, latencies, client.round_trips, sum(bot.calls.values()) - setup_calls)
+
+
+async def run_broadcast(args) -> dict:
+    """One broadcast_task to --ops recipients; an op is one recipient"""
+    client = reset_db(args.db_latency_ms / 1000)
+    seed_users(client, args.ops - 1)
+    bot = FakeBot(args.bot_latency_ms / 1000)
+    await bot.initialize()
+    setup_calls = sum(bot.calls.values())
+    job = broadcast_store.create_job(ADMIN_ID, "📢 benchmark")
+    context = SimpleNamespace(bot=bot, bot_data={})
+
+    started = time.perf_counter()
+    await broadcast_task(context, job)
+    elapsed = time.perf_counter() - started
+    await bot.shutdown()
+    # No per-recipient timing from the engine - latency columns stay empty
+    return result(args.ops, elapsed, [], client.round_trips, sum(bot.calls.values()) - setup_calls)
+
+
+def compare(old: dict, new: dict) -> str:
+    lines = [f"{'scenario':<16} {'metric':<20} {'old':>10} {'new':>10} {'change':>8}"]
+    for name, metrics in new["results"].items():
+        for metric, value in metrics.items():
+            before = old.get("results", {}).get(name, {}).get(metric)
+            if value is None or before is None or metric == "ops":
+                continue
+            change = f"{(value - before) / before * 100:+.1f}%" if before else "n/a"
+            lines.append(f"{name:<16} {metric:<20} {before:>10} {value:>10} {change:>8}")
+    return "\n".join(lines)
+
+
+async def run(args) -> dict:
+    names = list(SCENARIOS) + ["broadcast_task"]
+    if args.only:
+        names = [name for name in names if name in args.only.split(",")]
+    results = {}
+    for name in names:
+        random.seed(0)  # same rewards every run
+        results[name] = await (run_broadcast(args) if name == "broadcast_task" else run_handler(name, args))
+        print(f"{name:<16} {results[name]['ops_per_sec']:>9} ops/s  p50 {results[name]['p50_ms']} ms  "
+              f"p99 {results[name]['p99_ms']} ms  {results[name]['round_trips_per_op']} rt/op",
+              file=sys.stderr)
+    return {
+        "config": {
+            "ops": args.ops,
+            "concurrency": args.concurrency,
+            "db_latency_ms": args.db_latency_ms,
+            "bot_latency_ms": args.bot_latency_ms,
+        },
+        "results": results,
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Offline handler benchmarks")
+    parser.add_argument("--ops", type=int, default=200, help="operations per scenario")
+    parser.add_argument("--concurrency", type=int, default=1, help="operations in flight")
+    parser.add_argument("--db-latency-ms", type=float, default=5.0, help="injected per round trip")
+    parser.add_argument("--bot-latency-ms", type=float, default=0.0, help="injected per Bot API call")
+    parser.add_argument("--only", help="comma separated scenario names")
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    parser.add_argument("--compare", help="earlier JSON output to compare against")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(json.load(f), report), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -1,35 +1,107 @@
 from telegram import Update
 from telegram.ext import ContextTypes, CommandHandler
 from utils.supabase import db
+from utils.broadcaster import Broadcaster, BROADCAST_PROGRESS_SECONDS
+from utils.broadcast_store import broadcast_store
+from utils.log import get_logger
 import os
+import time
 import asyncio
 from datetime import date, timedelta
 
 ADMIN_ID = int(os.getenv("ADMIN_ID", "7836675446"))
+BROADCAST_AUTO_RESUME = os.getenv("BROADCAST_AUTO_RESUME", "1") == "1"
 
-# Global variable to store failed users from broadcast
-failed_broadcast_users = []
+log = get_logger(__name__)
 
-async def broadcast_task(context, admin_id, message, active_users):
-    """Run broadcast in background and track failed users"""
-    global failed_broadcast_users
+def _progress_text(stats: dict) -> str:
+    return (
+        f"📤 <b>Broadcasting...</b>\n\n"
+        f"✅ <b>Delivered:</b> {stats['sent']}/{stats['total']}\n"
+        f"❌ <b>Failed:</b> {stats['failed']} (🚫 {stats['permanent']} blocked)\n"
+        f"🔁 <b>Retries:</b> {stats['retries']}\n"
+        f"⚡ <b>Throughput:</b> {stats['throughput']:.1f} msg/s (limit {stats['rate_limit']:.0f}/s)\n"
+        f"⏳ <b>Flood waits:</b> {stats['flood_waits']}"
+    )
+
+async def broadcast_task(context, job):
+    """Run (or resume) a persisted broadcast job in background
+
+    Recipients are streamed page by page from db.iter_user_ids, starting after
+    the job's checkpoint cursor, and delivered by the rate-limited worker pool
+    in utils/broadcaster.py. The cursor is saved to the local job store every
+    BROADCAST_CHECKPOINT_EVERY recipients, so a restart resumes from there.
+    Only permanent failures (blocked / chat gone) are saved for /cleanup;
+    timeouts are retried and flood waits are waited out.
+    """
+    admin_id = job["admin_id"]
+    
+    async def save_checkpoint(cursor, done_above, stats, failed, recovered):
+        broadcast_store.checkpoint(job["id"], cursor, done_above, stats, failed, recovered)
+    
+    engine = Broadcaster(
+        context.bot, job["message"],
+        start_cursor=job["cursor"], skip=job["done_above"], counts=job,
+        is_failed=broadcast_store.is_failed, on_checkpoint=save_checkpoint
+    )
+    context.bot_data['broadcast_engine'] = engine
     
-    success_count = 0
-    failed_count = 0
-    total_users = len(active_users)
-    failed_broadcast_users = []  # Reset before broadcast
+    status_message = None
+    try:
+        status_message = await context.bot.send_message(admin_id, "📤 <b>Broadcasting...</b>", parse_mode='HTML')
+    except:
+        pass
     
-    for i, user_id in enumerate(active_users, 1):
+    async def show_progress(stats):
+        if status_message:
+            await status_message.edit_text(_progress_text(stats), parse_mode='HTML')
+    
+    user_pages = db.iter_user_ids(active_since=job["active_since"], start_after=job["cursor"])
+    try:
+        stats = await engine.run(user_pages, on_progress=show_progress, progress_every=BROADCAST_PROGRESS_SECONDS)
+    except Exception as e:
+        # Recipient scan failed (database error) - engine.run checkpointed what it delivered
+        broadcast_store.set_status(job["id"], "paused")
+        stats = engine.stats()
+        log.error("broadcast_scan_failed", job_id=job["id"], sent=stats["sent"], error=str(e))
         try:
-            await context.bot.send_message(chat_id=user_id, text=message, parse_mode='HTML')
-            success_count += 1
+            await context.bot.send_message(
+                admin_id,
+                f"⏸️ <b>Broadcast #{job['id']} PAUSED</b>\n\n"
+                f"Could not read the recipient list: {str(e)[:200]}\n\n"
+                f"✅ <b>Delivered so far:</b> {stats['sent']}\n"
+                f"Use /broadcast resume or /broadcast cancel.",
+                parse_mode='HTML'
+            )
         except:
-            failed_count += 1
-            failed_broadcast_users.append(user_id)  # Store failed user
-        
-        # Delay every 30 messages to avoid rate limit
-        if i % 30 == 0:
-            await asyncio.sleep(1)
+            pass
+        return
+    
+    total_users = stats["total"]
+    success_count = stats["sent"]
+    failed_count = stats["failed"]
+    
+    if engine.cancelled:
+        try:
+            await context.bot.send_message(
+                admin_id,
+                f"🛑 <b>Broadcast #{job['id']} CANCELLED</b>\n\n"
+                f"✅ <b>Delivered:</b> {success_count}/{total_users}\n"
+                f"❌ <b>Failed:</b> {failed_count}",
+                parse_mode='HTML'
+            )
+        except:
+            pass
+        return
+    
+    broadcast_store.set_status(job["id"], "done")
+    
+    if total_users == 0:
+        try:
+            await context.bot.send_message(admin_id, "❌ <b>No active users!</b>", parse_mode='HTML')
+        except:
+            pass
+        return
     
     # Send final report to admin
     try:
@@ -39,15 +111,27 @@ async def broadcast_task(context, admin_id, message, active_users):
             f"👥 <b>Total:</b> {total_users}\n"
             f"✅ <b>Delivered:</b> {success_count}\n"
             f"❌ <b>Failed:</b> {failed_count}\n"
-            f"📈 <b>Success Rate:</b> {(success_count/total_users*100):.1f}%\n\n"
-            f"💡 Run /cleanup to remove the {failed_count} failed users",
+            f"   🚫 Blocked / chat gone: {stats['permanent']}\n"
+            f"   📡 Network errors (after retries): {stats['transient']}\n"
+            f"   ⌛ Timed out, may have arrived (not resent): {stats['uncertain']}\n"
+            f"   ⚠️ Other errors: {stats['other']}\n"
+            f"📈 <b>Success Rate:</b> {(success_count/total_users*100):.1f}%\n"
+            f"⚡ <b>Throughput:</b> {stats['throughput']:.1f} msg/s in {stats['elapsed']:.0f}s\n"
+            f"⏳ <b>Flood waits:</b> {stats['flood_waits']}\n\n"
+            f"💡 Run /cleanup to remove the {broadcast_store.failed_count()} blocked users",
             parse_mode='HTML'
         )
     except:
         pass
 
+def start_broadcast_job(context, job):
+    """Mark broadcast as running and run the job in background (non-blocking)"""
+    context.bot_data['broadcast_running'] = True
+    broadcast_store.set_status(job["id"], "running")
+    asyncio.create_task(broadcast_task_wrapper(context, job))
+
 async def broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Start broadcast in background"""
+    """Start, resume, cancel or inspect a broadcast job"""
     if update.effective_user.id != ADMIN_ID:
         await update.message.reply_text("❌ <b>Admin only!</b>", parse_mode='HTML')
         return
@@ -55,55 +139,126 @@ async def broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not context.args:
         await update.message.reply_text(
             "📢 <b>BROADCAST USAGE:</b>\n\n"
-            "<code>/broadcast Hello everyone!</code>",
+            "<code>/broadcast Hello everyone!</code>\n"
+            "<code>/broadcast status</code>\n"
+            "<code>/broadcast resume</code>\n"
+            "<code>/broadcast cancel</code>",
             parse_mode='HTML'
         )
         return
     
-    active_users = await db.get_active_users()
-    total_users = len(active_users)
+    running = context.bot_data.get('broadcast_running', False)
+    job = broadcast_store.active_job()
+    command = context.args[0].lower() if len(context.args) == 1 else None
     
-    if total_users == 0:
-        await update.message.reply_text("❌ <b>No active users!</b>", parse_mode='HTML')
+    if command in ("status", "resume", "cancel"):
+        if not job:
+            await update.message.reply_text("ℹ️ <b>No unfinished broadcast.</b>", parse_mode='HTML')
+            return
+        
+        if command == "status":
+            await update.message.reply_text(
+                f"📋 <b>Broadcast #{job['id']}</b> ({'running' if running else job['status']})\n\n"
+                f"✅ <b>Delivered:</b> {job['sent']}/{job['total']}\n"
+                f"❌ <b>Failed:</b> {job['failed']}\n"
+                f"📍 <b>Checkpoint:</b> user {job['cursor']}\n"
+                f"📨 <b>Message:</b> {job['message'][:50]}...",
+                parse_mode='HTML'
+            )
+        elif command == "cancel":
+            broadcast_store.set_status(job["id"], "cancelled")
+            engine = context.bot_data.get('broadcast_engine')
+            if running and engine:
+                engine.cancel()
+            await update.message.reply_text(f"🛑 <b>Broadcast #{job['id']} cancelled.</b>", parse_mode='HTML')
+        elif running:
+            await update.message.reply_text("⚠️ <b>Broadcast already running!</b>", parse_mode='HTML')
+        else:
+            start_broadcast_job(context, job)
+            await update.message.reply_text(
+                f"▶️ <b>Broadcast #{job['id']} RESUMED</b>\n"
+                f"✅ <b>Delivered so far:</b> {job['sent']}",
+                parse_mode='HTML'
+            )
         return
     
     message = " ".join(context.args)
     
-    # Check if broadcast already running
-    if 'broadcast_running' in context.bot_data and context.bot_data['broadcast_running']:
+    # Check if broadcast already running (or interrupted and waiting)
+    if running or job:
         await update.message.reply_text(
             "⚠️ <b>Broadcast already running!</b>\n\n"
-            "Wait for it to complete before starting another.",
+            "Wait for it to complete, or use /broadcast resume or /broadcast cancel.",
             parse_mode='HTML'
         )
         return
     
-    # Mark broadcast as running
-    context.bot_data['broadcast_running'] = True
+    active_since = (date.today() - timedelta(days=30)).isoformat()
+    job = broadcast_store.create_job(update.effective_user.id, message, active_since)
     
     await update.message.reply_text(
-        f"📤 <b>Broadcast STARTED in background!</b>\n\n"
-        f"👥 <b>Active users:</b> {total_users}\n"
+        f"📤 <b>Broadcast #{job['id']} STARTED in background!</b>\n\n"
+        f"👥 <b>Recipients:</b> active users (streamed page by page)\n"
         f"📨 <b>Message:</b> {message[:50]}...\n\n"
         f"⏳ You can use other features while broadcasting!\n"
         f"Final report will be sent when complete.",
         parse_mode='HTML'
     )
     
-    # Run broadcast in background (non-blocking)
-    asyncio.create_task(broadcast_task_wrapper(context, update.effective_user.id, message, active_users))
+    start_broadcast_job(context, job)
+
+async def broadcast_task_wrapper(context, job):
+    """Wrapper to handle background task
 
-async def broadcast_task_wrapper(context, admin_id, message, active_users):
-    """Wrapper to handle background task"""
+    A job is never left "running" once its task is gone, except when the
+    task is cancelled at shutdown - "running" is what makes
+    resume_broadcasts() pick it up after the restart.
+    """
+    shutting_down = False
     try:
-        await broadcast_task(context, admin_id, message, active_users)
+        await broadcast_task(context, job)
+    except asyncio.CancelledError:
+        shutting_down = True
+        raise
+    except Exception as e:
+        log.error("broadcast_failed", job_id=job["id"], error=str(e), exc_info=True)
+        try:
+            await context.bot.send_message(
+                job["admin_id"],
+                f"⏸️ <b>Broadcast #{job['id']} PAUSED</b> after an error: {str(e)[:200]}\n\n"
+                f"Use /broadcast resume or /broadcast cancel.",
+                parse_mode='HTML'
+            )
+        except:
+            pass
     finally:
         context.bot_data['broadcast_running'] = False
+        context.bot_data.pop('broadcast_engine', None)
+        if not shutting_down:
+            current = broadcast_store.get_job(job["id"])
+            if current and current["status"] == "running":
+                broadcast_store.set_status(job["id"], "paused")
 
-async def cleanup(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Delete users who failed during last broadcast"""
-    global failed_broadcast_users
+async def resume_broadcasts(app):
+    """On startup, pick up a broadcast interrupted by a restart (post_init)"""
+    job = broadcast_store.active_job()
+    if not job or job["status"] != "running":
+        return
+    
+    if BROADCAST_AUTO_RESUME:
+        start_broadcast_job(app, job)
+        text = f"▶️ <b>Broadcast #{job['id']} resumed after restart</b> ({job['sent']} already delivered)"
+    else:
+        broadcast_store.set_status(job["id"], "paused")
+        text = f"⏸️ <b>Broadcast #{job['id']} paused by restart.</b>\n\nUse /broadcast resume or /broadcast cancel."
     
+    try:
+        await app.bot.send_message(job["admin_id"], text, parse_mode='HTML')
+    except:
+        pass
+
+async def cleanup(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Delete users whose broadcasts failed permanently (blocked / chat gone)"""
     if update.effective_user.id != ADMIN_ID:
         await update.message.reply_text("❌ <b>Admin only!</b>", parse_mode='HTML')
         return
@@ -116,8 +271,8 @@ async def cleanup(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     
-    # Check if we have failed users from broadcast
-    if not failed_broadcast_users or len(failed_broadcast_users) == 0:
+    # Check if we have failed users from broadcast (persisted across restarts)
+    if broadcast_store.failed_count() == 0:
         await update.message.reply_text(
             "ℹ️ <b>No failed users to cleanup!</b>\n\n"
             "Run /broadcast first, then /cleanup to remove blocked users.",
@@ -127,7 +282,7 @@ async def cleanup(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     context.bot_data['cleanup_running'] = True
     
-    total_to_delete = len(failed_broadcast_users)
+    total_to_delete = broadcast_store.failed_count()
     await update.message.reply_text(
         f"🧹 <b>Cleanup STARTED!</b>\n\n"
         f"Removing {total_to_delete} blocked users from broadcast..."
@@ -136,58 +291,57 @@ async def cleanup(update: Update, context: ContextTypes.DEFAULT_TYPE):
     asyncio.create_task(cleanup_task_wrapper(context, update.effective_user.id))
 
 async def cleanup_task_wrapper(context, admin_id):
-    """Background cleanup - delete users who failed broadcast"""
-    global failed_broadcast_users
-    
+    """Background cleanup - bulk delete users who failed broadcast"""
     try:
-        total_to_delete = len(failed_broadcast_users)
-        deleted_count = 0
+        failed_users = broadcast_store.failed_ids()
+        total_to_delete = len(failed_users)
         
-        await context.bot.send_message(
+        status_message = await context.bot.send_message(
             admin_id,
             f"🧹 <b>Deleting {total_to_delete} blocked users from database...</b>",
             parse_mode='HTML'
         )
         
-        for i, user_id in enumerate(failed_broadcast_users, 1):
+        last_update = 0.0
+        
+        async def show_progress(done, total, deleted):
+            # Edit one status message at most every 2 seconds
+            nonlocal last_update
+            now = time.monotonic()
+            if now - last_update < 2 and done < total:
+                return
+            last_update = now
             try:
-                if await db.delete_user(user_id):
-                    deleted_count += 1
+                await status_message.edit_text(
+                    f"🔄 <b>Cleanup Progress:</b> {done}/{total}\n"
+                    f"🗑️ <b>Deleted:</b> {deleted}",
+                    parse_mode='HTML'
+                )
             except:
                 pass
-            
-            # Delay every 20 deletes
-            if i % 20 == 0:
-                await asyncio.sleep(0.5)
-            
-            # Send progress every 50 deletes
-            if i % 50 == 0 or i == total_to_delete:
-                progress = (
-                    f"🔄 <b>Cleanup Progress:</b> {i}/{total_to_delete}\n"
-                    f"🗑️ <b>Deleted:</b> {deleted_count}"
-                )
-                try:
-                    await context.bot.send_message(admin_id, progress, parse_mode='HTML')
-                except:
-                    pass
         
-        # Get new total user count
-        all_users = await db.get_all_user_ids()
-        remaining_users = len(all_users)
+        started = time.monotonic()
+        deleted = await db.delete_users_bulk(failed_users, on_progress=show_progress)
+        elapsed = time.monotonic() - started
+        deleted_count = len(deleted)
+        
+        # Only ids that were deleted - a failed chunk is retried by the next /cleanup
+        broadcast_store.forget_failed(deleted)
+        
+        # Get new total user count (server-side count, no id download)
+        remaining_users = await db.count_users()
         
         await context.bot.send_message(
             admin_id,
             f"✅ <b>CLEANUP COMPLETE!</b>\n\n"
             f"🗑️ <b>Deleted:</b> {deleted_count}\n"
             f"👥 <b>Remaining Active Users:</b> {remaining_users}\n"
-            f"📉 <b>Removed:</b> {(deleted_count/total_to_delete*100):.1f}% of failed users\n\n"
+            f"📉 <b>Removed:</b> {(deleted_count/total_to_delete*100):.1f}% of failed users\n"
+            f"⚡ <b>Speed:</b> {total_to_delete/elapsed if elapsed else 0:.0f} users/s\n\n"
             f"💡 Database cleaned! Ready for next broadcast.",
             parse_mode='HTML'
         )
         
-        # Clear failed users list after cleanup
-        failed_broadcast_users = []
-        
     finally:
         context.bot_data['cleanup_running'] = False
 
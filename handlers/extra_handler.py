@@ -1,6 +1,7 @@
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update
 from telegram.ext import ContextTypes, MessageHandler, filters
 from utils.supabase import db
+from handlers import ui
 
 async def extra(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Extra info page - INSTANT (reads from stats table)"""
@@ -20,21 +21,9 @@ async def extra(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # INSTANT - reads from stats table (no calculation)
     total_users = await db.get_total_user_count()
     
-    keyboard = [
-        [InlineKeyboardButton("📢 Channel", url="https://t.me/CashyAds")],
-        [InlineKeyboardButton("💬 Support", url="https://t.me/CashyadsSupportBot")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
     await update.message.reply_text(
-        f"➡️ <b>EXTRA INFO</b>\n\n"
-        f"👤 <b>Your Stats:</b>\n"
-        f"💰 Balance: ₹{balance:.1f}\n"
-        f"👥 Referrals: {referrals}\n\n"
-        f"📊 <b>Bot Stats:</b>\n"
-        f"👥 Total Users: {total_users:,}\n\n"
-        f"📢 <b>Official Links:</b>",
-        reply_markup=reply_markup,
+        ui.EXTRA.format(balance=balance, referrals=referrals, total_users=total_users),
+        reply_markup=ui.EXTRA_LINKS,
         parse_mode='HTML'
     )
 
@@ -0,0 +1,56 @@
+from telegram import Update
+from telegram.ext import ContextTypes, CommandHandler
+from utils.supabase import db
+from utils.metrics import metrics, METRICS_PORT
+from utils.user_locks import user_locks
+from utils.sharding import SHARDS, ADMIN_SHARD
+import os
+
+ADMIN_ID = int(os.getenv("ADMIN_ID", "7836675446"))
+
+async def perf(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Admin: per-handler latency, DB round trips per update, slowest DB methods
+
+    With SHARDS > 1 /perf always runs on ADMIN_SHARD, so every number covers
+    that worker process only - the other shards serve theirs on /metrics.
+    """
+    if update.effective_user.id != ADMIN_ID:
+        await update.message.reply_text("❌ <b>Admin only!</b>", parse_mode='HTML')
+        return
+
+    lines = ["handler          calls   p50ms   p95ms  err  db/upd"]
+    for name, calls, p50, p95, errors, db_calls in metrics.summary()[:12]:
+        lines.append(f"{name[:16]:<16} {calls:>5} {p50 * 1000:>7.0f} {p95 * 1000:>7.0f} {errors:>4} {db_calls:>7.1f}")
+
+    db_rows = sorted(metrics.db_latency.items(), key=lambda item: item[1].sum, reverse=True)[:8]
+    lines.append("")
+    lines.append("db method        calls   avgms   p95ms  err")
+    for name, h in db_rows:
+        lines.append(f"{name[:16]:<16} {h.count:>5} {h.mean * 1000:>7.0f} {h.quantile(0.95) * 1000:>7.0f} {metrics.db_errors[name]:>4}")
+
+    trips = metrics.round_trips
+    cache = db.cache_stats()
+    locks = user_locks.stats()
+    pool = db.pool_stats()
+    pool_line = (f"{pool['busy']}/{pool['max_connections']} busy, {pool['queued']} queued, "
+                 if "max_connections" in pool else "")
+
+    scope = ""
+    if SHARDS > 1:
+        scope = f"🧩 <b>Shard {ADMIN_SHARD} of {SHARDS} only</b>"
+        if METRICS_PORT:
+            scope += f" - all shards: /metrics on ports {METRICS_PORT}-{METRICS_PORT + SHARDS - 1}"
+        scope += "\n\n"
+
+    await update.message.reply_text(
+        f"📈 <b>PERFORMANCE</b>\n\n"
+        f"{scope}"
+        f"<pre>{chr(10).join(lines)}</pre>\n\n"
+        f"🔁 <b>DB round trips:</b> {trips.count} (p50 {trips.quantile(0.5) * 1000:.0f} ms, p95 {trips.quantile(0.95) * 1000:.0f} ms)\n"
+        f"🗃️ <b>User cache:</b> {cache['hit_rate']:.0%} hits ({cache['size']} cached)\n"
+        f"🔒 <b>User locks:</b> {locks['contended']}/{locks['acquired']} waited, max {locks['wait_max'] * 1000:.0f} ms\n"
+        f"🔌 <b>DB pool:</b> {pool_line}{pool['in_flight']} in flight (max {pool['in_flight_max']})",
+        parse_mode='HTML'
+    )
+
+perf_handler = CommandHandler("perf", perf)
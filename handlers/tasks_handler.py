@@ -1,10 +1,9 @@
 from telegram import Update
 from telegram.ext import ContextTypes
+from handlers import ui
 
 async def tasks_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(
-        "<b>📋 Tasks Coming Soon!</b>\n\n"
-        "🚧 Our new tasks system is under development.\n"
-        "✅ Watch ads and use referrals to keep earning in the meantime!",
+        ui.TASKS_COMING_SOON,
         parse_mode="HTML"
     )
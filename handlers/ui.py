@@ -0,0 +1,286 @@
+"""Static keyboards and message templates - built ONCE at import
+
+Handlers only fill in the dynamic fields (str.format) of these templates and
+reuse the markup objects, so nothing is rebuilt per request.
+"""
+import os
+from dotenv import load_dotenv
+from telegram import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton, WebAppInfo
+from utils.log import get_logger
+
+load_dotenv()
+
+log = get_logger(__name__)
+
+MINI_APP_URL = os.getenv("MINI_APP_URL", "https://teleadviewer.pages.dev/")
+BOT_USERNAME = os.getenv("BOT_USERNAME", "Cashyadsbot")
+
+# ============================================
+# KEYBOARDS
+# ============================================
+
+def _build_main_keyboard():
+    keyboard = []
+
+    # Add Watch Ads button with web app (only if URL exists)
+    if MINI_APP_URL:
+        try:
+            keyboard.append([KeyboardButton("Watch Ads 💰", web_app=WebAppInfo(url=MINI_APP_URL))])
+            log.info("watch_ads_button", url=MINI_APP_URL)
+        except Exception as e:
+            log.warning("watch_ads_webapp_failed", error=str(e))
+            keyboard.append([KeyboardButton("Watch Ads 💰")])
+    else:
+        log.warning("mini_app_url_missing")
+        keyboard.append([KeyboardButton("Watch Ads 💰")])
+
+    keyboard.append([KeyboardButton("Balance 💳"), KeyboardButton("Bonus 🎁")])
+    keyboard.append([KeyboardButton("Refer and Earn 👥"), KeyboardButton("Tasks 📋")])
+    keyboard.append([KeyboardButton("Extra ➡️")])
+
+    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
+
+MAIN_KEYBOARD = _build_main_keyboard()
+
+WITHDRAW_BUTTON = InlineKeyboardMarkup([[InlineKeyboardButton("💰 Withdraw", callback_data="withdraw")]])
+
+WITHDRAW_METHODS = InlineKeyboardMarkup([
+    [InlineKeyboardButton("💳 Paytm", callback_data="withdraw_paytm")],
+    [InlineKeyboardButton("📱 UPI", callback_data="withdraw_upi")],
+    [InlineKeyboardButton("🏦 Bank Transfer", callback_data="withdraw_bank")],
+    [InlineKeyboardButton("💵 Paypal", callback_data="withdraw_paypal")],
+    [InlineKeyboardButton("₿ USDT (TRC20)", callback_data="withdraw_usdt")],
+    [InlineKeyboardButton("⬅️ Back", callback_data="back_balance")]
+])
+
+BACK_TO_METHODS = InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ Back", callback_data="back_methods")]])
+
+# One confirm keyboard per method (callback data is the only dynamic part)
+CONFIRM_WITHDRAW = {
+    method: InlineKeyboardMarkup([
+        [InlineKeyboardButton("✅ Confirm Withdrawal", callback_data=f"confirm_withdraw_{method}")],
+        [InlineKeyboardButton("⬅️ Back", callback_data="back_methods")]
+    ])
+    for method in ("PAYTM", "UPI", "BANK", "PAYPAL", "USDT")
+}
+
+EXTRA_LINKS = InlineKeyboardMarkup([
+    [InlineKeyboardButton("📢 Channel", url="https://t.me/CashyAds")],
+    [InlineKeyboardButton("💬 Support", url="https://t.me/CashyadsSupportBot")]
+])
+
+# ============================================
+# MESSAGE TEMPLATES
+# ============================================
+
+WELCOME = (
+    "<b>👋 Welcome to Cashyads2!</b>\n\n"
+    "💰 <b>Watch ads</b> - Earn 3-5 Rs each\n"
+    "👥 <b>Refer</b> - Earn 40 Rs + 5% commission\n"
+    "🎁 <b>Daily bonus</b> - 5 Rs once/day\n"
+    "📋 <b>Daily tasks</b> - 100 Rs (4 tasks)\n\n"
+    "<i>Start earning now! 🚀</i>"
+)
+
+USE_BUTTONS = "👇 <b>Use the buttons!</b>"
+
+REFERRAL_SUCCESS = (
+    "<b>🎉 REFERRAL SUCCESS!</b>\n\n"
+    "👤 New user: {username}\n"
+    "<b>💰 You earned 40 Rs INSTANTLY!</b>\n\n"
+    "💳 Balance: <b>{balance:.1f} Rs</b>\n"
+    "👥 Referrals: <b>{referrals}</b>"
+)
+
+AD_REWARD = (
+    "<b>✅ Ad watched successfully!</b>\n\n"
+    "💰 <b>You earned {reward:.1f} Rs</b>\n"
+    "💳 New balance: <b>{balance:.1f} Rs</b>"
+)
+
+AD_CANCELLED = (
+    "❌ Ad cancelled!\n\n"
+    "Try again! 🔄"
+)
+
+BALANCE = (
+    "💳 <b>Your Balance</b>\n\n"
+    "💵 <b>{balance:.1f} Rs</b>\n\n"
+    "Ready to withdraw?"
+)
+
+BONUS_CLAIMED = (
+    "<b>🎁 Daily Bonus Claimed!</b>\n\n"
+    "✅ <b>5 Rs added</b> to your balance!\n\n"
+    "💳 Balance: <b>{balance:.1f} Rs</b>"
+)
+
+BONUS_ALREADY_CLAIMED = (
+    "<b>⏳ Already Claimed Today!</b>\n\n"
+    "⏰ Come back tomorrow for another 5 Rs bonus!"
+)
+
+BONUS_ERROR = "❌ Error processing bonus. Try again!"
+
+USER_NOT_FOUND = "❌ User not found!"
+
+REFER = (
+    "<b>👥 Referral Program</b>\n\n"
+    "<code>{link}</code>\n\n"
+    "<b>Your Stats:</b>\n"
+    "👥 Referrals: <b>{referrals}</b>\n\n"
+    "<b>💰 Earnings:</b>\n"
+    "💵 <b>40 Rs INSTANT</b> per referral\n"
+    "💵 <b>5% commission</b> on their ad earnings\n\n"
+    "👇 Click to share!"
+)
+
+REFER_ERROR = "❌ Error loading referral info!"
+
+REFERRAL_LINK = "https://t.me/" + BOT_USERNAME + "?start={code}"
+SHARE_URL = "https://t.me/share/url?url={link}&text=Join%20Cashyads2%20and%20earn%20money%20watching%20ads%20%F0%9F%92%B0"
+
+WITHDRAW_METHODS_TEXT = (
+    "<b>💳 Choose Payment Method</b>\n\n"
+    "<i>Select your preferred withdrawal method below:</i>"
+)
+
+WITHDRAW_READY = (
+    "<b>💳 Withdrawal Ready!</b>\n\n"
+    "<b>💰 Amount:</b> ₹{balance:.1f}\n"
+    "<b>📌 Method:</b> {method}\n"
+    "<b>👥 Referrals:</b> {referrals}\n\n"
+    "✅ <i>All requirements met!</i>\n"
+    "<b>Click confirm to proceed.</b>"
+)
+
+WITHDRAW_DENIED = (
+    "<b>❌ Cannot Withdraw!</b>\n\n"
+    "<b>📌 Method Selected:</b> {method}\n\n"
+    "<b>❌ Why you can't withdraw:</b>\n"
+    "<i>{reason}</i>\n\n"
+    "<b>📋 Requirements:</b>\n"
+    "💵 Minimum balance: <b>380 Rs</b>\n"
+    "👥 Minimum referrals: <b>12</b>\n\n"
+    "<i>Keep earning to unlock withdrawals!</i>"
+)
+
+# Per-method prompt for payment details: (title, method label, instructions)
+_PAYMENT_PROMPT = (
+    "<b>{title}</b>\n\n"
+    "💰 <b>Amount:</b> ₹{{balance:.1f}}\n"
+    "📌 <b>Method:</b> {label}\n\n"
+    "{instructions}"
+)
+
+PAYMENT_PROMPTS = {
+    method: _PAYMENT_PROMPT.format(title=title, label=label, instructions=instructions)
+    for method, (title, label, instructions) in {
+        "PAYTM": (
+            "💳 Enter Your Paytm Number", "PAYTM",
+            "<i>Please reply with your 10-digit Paytm number.</i>\n"
+            "<b>Example:</b> <code>9876543210</code>"
+        ),
+        "UPI": (
+            "📱 Enter Your UPI ID", "UPI",
+            "<i>Please reply with your UPI ID.</i>\n"
+            "<b>Examples:</b>\n"
+            "<code>username@paytm</code>\n"
+            "<code>name@okhdfcbank</code>"
+        ),
+        "BANK": (
+            "🏦 Enter Your Bank Details", "BANK TRANSFER",
+            "<i>Please reply with your details in this format:</i>\n"
+            "<code>Account Number\nIFSC Code\nAccount Holder Name</code>\n\n"
+            "<b>Example:</b>\n"
+            "<code>1234567890\nHDFC0000123\nJohn Doe</code>"
+        ),
+        "PAYPAL": (
+            "💵 Enter Your PayPal Email", "PAYPAL",
+            "<i>Please reply with your PayPal email address.</i>\n"
+            "<b>Example:</b> <code>john@gmail.com</code>"
+        ),
+        "USDT": (
+            "₿ Enter Your USDT (TRC20) Wallet", "USDT (TRC20)",
+            "<i>Please reply with your TRC20 wallet address.</i>\n"
+            "<b>Example:</b>\n"
+            "<code>TQCp8xxxxxxxxxxxxxxxxxxxxxxxxxxx</code>"
+        ),
+    }.items()
+}
+
+SESSION_EXPIRED = (
+    "❌ Session expired!\n\n"
+    "Please start withdrawal again from Balance button."
+)
+
+WITHDRAW_PROCESSED = (
+    "<b>✅ Withdrawal Processed!</b>\n\n"
+    "💰 <b>Amount:</b> ₹{amount:.1f}\n"
+    "📌 <b>Method:</b> {method}\n"
+    "<b>✓ Payment Details Received</b>\n\n"
+    "<b>⏳ Status:</b> <i>Processing...</i>\n"
+    "<i>Admin will contact within 24h</i>\n\n"
+    "<b>💳 New Balance:</b> {balance:.1f} Rs"
+)
+
+WITHDRAW_CONFIRMATION = (
+    "<b>🎉 WITHDRAWAL CONFIRMATION</b>\n\n"
+    "<i>Your withdrawal request has been</i> <b>SUCCESSFULLY SUBMITTED</b>\n\n"
+    "<b>📌 Processing Details:</b>\n"
+    "⏱️ Processing time: <b>5-7 working days</b>\n"
+    "<i>(Excludes weekends & public holidays)</i>\n"
+    "<i>Depends on your bank/payment service</i>\n\n"
+    "<b>❓ Why it takes time:</b>\n"
+    "🔐 Bank verification & KYC checks\n"
+    "🔄 Payment gateway processing\n"
+    "🛡️ Fraud prevention & security\n"
+    "📅 Weekend/holiday delays\n\n"
+    "<b>📋 What happens next:</b>\n"
+    "1️⃣ Our admin verifies your request\n"
+    "2️⃣ Amount transferred to your account\n"
+    "3️⃣ Bank processes the payment\n"
+    "4️⃣ Money appears in your account\n\n"
+    "<b>💬 Need Help?</b>\n"
+    "📞 Contact @CashyadsSupportBot\n"
+    "⚠️ <i>We never charge for withdrawals!</i>\n"
+    "💡 <i>Keep earning more! Watch ads & refer friends.</i>"
+)
+
+# Admin notification per method: (emoji + title, method label, details label)
+_ADMIN_WITHDRAWAL = (
+    "<b>{title}</b>\n\n"
+    "👤 <b>User ID:</b> {{user_id}}\n"
+    "💰 <b>Amount:</b> ₹{{amount:.1f}}\n"
+    "📌 <b>Method:</b> {label}\n\n"
+    "<b>{details_label}:</b>\n"
+    "<code>{{details}}</code>\n\n"
+    "📅 {{today}}"
+)
+
+ADMIN_WITHDRAWALS = {
+    method: _ADMIN_WITHDRAWAL.format(title=title, label=label, details_label=details_label)
+    for method, (title, label, details_label) in {
+        "PAYTM": ("📱 NEW WITHDRAWAL - PAYTM", "PAYTM", "Paytm Number"),
+        "UPI": ("📱 NEW WITHDRAWAL - UPI", "UPI", "UPI ID"),
+        "BANK": ("🏦 NEW WITHDRAWAL - BANK TRANSFER", "BANK TRANSFER", "Bank Details"),
+        "PAYPAL": ("💵 NEW WITHDRAWAL - PAYPAL", "PAYPAL", "PayPal Email"),
+        "USDT": ("₿ NEW WITHDRAWAL - USDT (TRC20)", "USDT (TRC20)", "TRC20 Wallet"),
+    }.items()
+}
+
+EXTRA = (
+    "➡️ <b>EXTRA INFO</b>\n\n"
+    "👤 <b>Your Stats:</b>\n"
+    "💰 Balance: ₹{balance:.1f}\n"
+    "👥 Referrals: {referrals}\n\n"
+    "📊 <b>Bot Stats:</b>\n"
+    "👥 Total Users: {total_users:,}\n\n"
+    "📢 <b>Official Links:</b>"
+)
+
+TASKS_COMING_SOON = (
+    "<b>📋 Tasks Coming Soon!</b>\n\n"
+    "🚧 Our new tasks system is under development.\n"
+    "✅ Watch ads and use referrals to keep earning in the meantime!"
+)
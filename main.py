@@ -1,9 +1,16 @@
 import asyncio
-import logging
 import os
+import signal
+from pathlib import Path
 from dotenv import load_dotenv
+
+# Before the handler imports - they log while building keyboards
+load_dotenv()
+from utils.log import setup_logging, get_logger
+setup_logging()
+
 from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters
+from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, TypeHandler, filters
 from telegram.error import BadRequest
 
 # Import all handlers
@@ -13,37 +20,143 @@ from handlers.watch_ads_handler import (
     handle_payment_details, back_to_balance, back_methods, 
     get_main_keyboard
 )
-from handlers.broadcast_handler import broadcast_handler, cleanup_handler
+from handlers.broadcast_handler import broadcast_handler, cleanup_handler, resume_broadcasts
+from handlers.perf_handler import perf_handler
 from handlers.extra_handler import extra_handler
 from handlers.tasks_handler import tasks_handler
+from handlers import ui
+from utils.webhook import WebhookServer, make_ssl_context
+from utils.sharding import SHARDS, ADMIN_SHARD, ShardPool
+from utils.metrics import metrics, instrument_handlers, start_metrics_server, METRICS_PORT
+from utils.user_locks import user_locks, PerUserUpdateProcessor
 
-load_dotenv()
-logging.basicConfig(level=logging.INFO)
+log = get_logger("main")
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 if not BOT_TOKEN:
     raise ValueError("BOT_TOKEN missing!")
+# Signs referral links (utils/referral_codes.py) - never changes, unlike the bot token
+if not os.getenv("REFERRAL_SECRET"):
+    raise ValueError("REFERRAL_SECRET missing!")
+
+# polling | webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+# Updates handled at the same time - one user's updates still run one at a time, in order (utils/user_locks.py)
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "32"))
+# Keep updates Telegram queued while the bot was down (ad rewards!)
+DROP_PENDING_UPDATES = os.getenv("DROP_PENDING_UPDATES", "0") == "1"
+# Bot API endpoint - point at a local fake Telegram for tests
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+
+# Webhook mode
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # public base URL, e.g. https://bot.example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+# TLS served by the bot itself (PEM files); unset = plain HTTP behind a TLS-terminating proxy
+WEBHOOK_CERT = os.getenv("WEBHOOK_CERT")
+WEBHOOK_KEY = os.getenv("WEBHOOK_KEY")
+# Upload WEBHOOK_CERT to Telegram with setWebhook (self-signed certificates)
+WEBHOOK_SELF_SIGNED = os.getenv("WEBHOOK_SELF_SIGNED", "0") == "1"
+
+if BOT_MODE == "webhook" and not (WEBHOOK_URL and WEBHOOK_SECRET):
+    raise ValueError("WEBHOOK_URL and WEBHOOK_SECRET are required in webhook mode!")
 
 async def error_handler(update: Update, context):
     """Log errors with full details"""
-    logging.error(f"Update {update} caused error {context.error}")
-    if isinstance(context.error, BadRequest):
-        logging.error(f"BadRequest: {context.error}")
+    user = getattr(update, "effective_user", None)
+    log.error(
+        "bad_request" if isinstance(context.error, BadRequest) else "update_failed",
+        str(context.error),
+        user_id=user.id if user else None,
+        update_id=getattr(update, "update_id", None),
+        exc_info=context.error
+    )
 
 async def unknown(update: Update, context):
     """Handle unknown commands"""
     await update.message.reply_text(
-        "👇 <b>Use the buttons!</b>", 
-        reply_markup=get_main_keyboard(), 
+        ui.USE_BUTTONS,
+        reply_markup=get_main_keyboard(),
         parse_mode='HTML'
     )
 
-async def main():
+async def post_init(app: Application):
+    """Resume a broadcast interrupted by the last restart"""
+    await resume_broadcasts(app)
+
+async def post_shutdown(app: Application):
+    """Flush buffered balance credits before exit"""
     from utils.supabase import db
-    await db.init_table()
-    print("✅ Cashyads2 Ready!")
-    
-    app = Application.builder().token(BOT_TOKEN).build()
+    await db.close()
+
+async def run_webhook(app: Application):
+    """Serve updates pushed by Telegram until SIGINT/SIGTERM
+
+    Telegram only delivers webhooks over HTTPS (ports 443, 80, 88, 8443).
+    With WEBHOOK_CERT/WEBHOOK_KEY the server speaks TLS itself; without
+    them it is plain HTTP and a TLS-terminating reverse proxy must forward
+    WEBHOOK_URL to WEBHOOK_LISTEN:WEBHOOK_PORT.
+    """
+    async def on_update(data):
+        await app.update_queue.put(Update.de_json(data, app.bot))
+
+    ssl_context = make_ssl_context(WEBHOOK_CERT, WEBHOOK_KEY) if WEBHOOK_CERT else None
+    if ssl_context is None:
+        log.warning("webhook_plain_http", hint="needs a TLS-terminating reverse proxy in front")
+    server = WebhookServer(on_update, WEBHOOK_SECRET, WEBHOOK_PATH, WEBHOOK_LISTEN, WEBHOOK_PORT, ssl_context)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    await app.start()
+    await server.start()
+    try:
+        await app.bot.set_webhook(
+            url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            certificate=Path(WEBHOOK_CERT).read_bytes() if WEBHOOK_CERT and WEBHOOK_SELF_SIGNED else None,
+            allowed_updates=Update.ALL_TYPES,
+            drop_pending_updates=DROP_PENDING_UPDATES
+        )
+        log.info("webhook_set", url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH)
+        await stop.wait()
+    finally:
+        # Stop taking updates first - Telegram keeps anything unacknowledged
+        await server.stop()
+        await app.stop()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+        await app.shutdown()
+
+def application_builder(concurrent_updates=CONCURRENT_UPDATES, bot=None):
+    builder = Application.builder().concurrent_updates(concurrent_updates)
+    if bot is not None:
+        # A ready-made Bot, e.g. the benchmarks' fake one
+        return builder.bot(bot)
+    builder = builder.token(BOT_TOKEN)
+    if TELEGRAM_API_URL:
+        builder = builder.base_url(TELEGRAM_API_URL)
+    return builder
+
+def build_application(on_init=post_init, bot=None) -> Application:
+    """The bot with every handler registered (not started)
+
+    Updates of different users run concurrently, updates of one user in
+    arrival order (PerUserUpdateProcessor) - in single-process and shard mode.
+    """
+    builder = application_builder(PerUserUpdateProcessor(CONCURRENT_UPDATES), bot=bot)
+    builder = builder.post_shutdown(post_shutdown)
+    if on_init:
+        builder = builder.post_init(on_init)
+    app = builder.build()
     
     # Add error handler
     app.add_error_handler(error_handler)
@@ -112,6 +225,7 @@ async def main():
     
     app.add_handler(broadcast_handler)
     app.add_handler(cleanup_handler)
+    app.add_handler(perf_handler)
     
     # ============================================
     # FALLBACK HANDLER (Unknown commands)
@@ -119,15 +233,96 @@ async def main():
     
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, unknown))
     
-    print("🤖 Cashyads2 FULLY LIVE! ✅")
-    print("=" * 50)
-    print("✅ Command handlers registered")
-    print("✅ Message handlers registered")
-    print("✅ Callback handlers registered")
-    print("✅ Error handler registered")
-    print("=" * 50)
-    
-    await app.run_polling(drop_pending_updates=True)
+    # Latency / error / DB round-trip histograms per handler (/perf, METRICS_PORT)
+    instrument_handlers(app)
+    return app
+
+async def start_metrics(port: int):
+    from utils.supabase import db
+    metrics.gauge("bot_user_locks", user_locks.stats)
+    metrics.gauge("bot_user_cache", db.cache_stats)
+    metrics.gauge("bot_referrer_index", db.referrers.stats)
+    metrics.gauge("bot_db_pool", db.pool_stats)
+    await start_metrics_server(port)
+
+async def serve(app: Application):
+    if BOT_MODE == "webhook":
+        await run_webhook(app)
+    else:
+        await app.run_polling(drop_pending_updates=DROP_PENDING_UPDATES)
+
+# ============================================
+# SHARDED MODE (SHARDS > 1)
+# ============================================
+
+def run_shard(shard_id: int, shards: int, inbox):
+    """Worker process: the full bot, fed by the front process"""
+    # The front stops the workers in order - ignore Ctrl+C / SIGTERM sent to the whole group
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    # Each shard needs its own write-behind journal; shard 0 keeps the single-process one
+    if shard_id:
+        journal = os.getenv("BALANCE_JOURNAL_PATH", "balance_journal.log")
+        os.environ["BALANCE_JOURNAL_PATH"] = f"{journal}.{shard_id}"
+    asyncio.run(shard_main(shard_id, inbox))
+
+async def shard_main(shard_id: int, inbox):
+    from utils.supabase import db
+    await db.init_table()
+
+    # Broadcast jobs live with the admin commands
+    app = build_application(post_init if shard_id == ADMIN_SHARD else None)
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    await app.start()
+    if METRICS_PORT:
+        await start_metrics(METRICS_PORT + shard_id)
+    log.info("shard_ready", shard=shard_id)
+
+    async def on_update(data):
+        await app.update_queue.put(Update.de_json(data, app.bot))
+
+    try:
+        await ShardPool.feed(inbox, on_update)
+    finally:
+        await app.stop()
+        await post_shutdown(app)
+        await app.shutdown()
+
+async def run_front():
+    """Receive updates (polling or webhook) and forward them to the shard workers"""
+    pool = ShardPool(run_shard, SHARDS)
+
+    async def forward(update: Update, context):
+        pool.dispatch(update.to_dict())
+
+    async def front_init(app: Application):
+        pool.start()
+
+    async def front_shutdown(app: Application):
+        await asyncio.get_running_loop().run_in_executor(None, pool.stop)
+
+    # One at a time - forwarding order is the per-user processing order
+    app = application_builder(False).post_init(front_init).post_shutdown(front_shutdown).build()
+    app.add_handler(TypeHandler(Update, forward))
+    await serve(app)
+
+async def main():
+    if SHARDS > 1:
+        log.info("front_starting", shards=SHARDS, mode=BOT_MODE)
+        await run_front()
+        return
+
+    from utils.supabase import db
+    await db.init_table()
+    app = build_application()
+    if METRICS_PORT:
+        await start_metrics(METRICS_PORT)
+    log.info("bot_live", mode=BOT_MODE, concurrent_updates=CONCURRENT_UPDATES,
+             handlers=sum(len(group) for group in app.handlers.values()))
+
+    await serve(app)
 
 if __name__ == "__main__":
     import nest_asyncio
@@ -0,0 +1,207 @@
+-- ============================================
+-- Cashyads2 server-side functions
+-- Run once in the Supabase SQL editor (safe to re-run).
+-- Every function returns a table so PostgREST hands back a list of rows.
+-- utils/local_client.py mirrors these for offline runs.
+-- ============================================
+
+-- Atomic balance (and optional referral count) increment - ONE round trip
+create or replace function increment_balance(
+    p_user_id bigint,
+    p_amount numeric,
+    p_referrals integer default 0
+)
+returns table (balance numeric, referrals integer)
+language sql
+as $$
+    update users
+       set balance = users.balance + p_amount,
+           referrals = coalesce(users.referrals, 0) + p_referrals
+     where users.user_id = p_user_id
+    returning users.balance::numeric, users.referrals::integer;
+$$;
+
+-- ============================================
+-- Write-behind balance flush (utils/balance_buffer.py)
+-- ============================================
+
+-- Batch ids already applied - makes a replayed batch a no-op
+create table if not exists balance_batches (
+    batch_id text primary key,
+    applied_at timestamptz not null default now()
+);
+
+-- Apply many coalesced credits in ONE round trip: p_deltas = {"user_id": amount, ...}
+create or replace function apply_balance_deltas(p_batch_id text, p_deltas jsonb)
+returns table (user_id bigint, balance numeric)
+language plpgsql
+as $$
+#variable_conflict use_column
+begin
+    insert into balance_batches (batch_id) values (p_batch_id)
+    on conflict (batch_id) do nothing;
+    if not found then
+        return;  -- already applied (replay after a crash)
+    end if;
+
+    return query
+    update users u
+       set balance = u.balance + d.value::numeric
+      from jsonb_each_text(p_deltas) d
+     where u.user_id = d.key::bigint
+    returning u.user_id::bigint, u.balance::numeric;
+end;
+$$;
+
+-- ============================================
+-- Ad reward: credit user + 5% referrer commission in ONE round trip
+-- ============================================
+create or replace function credit_ad_reward(
+    p_user_id bigint,
+    p_reward numeric,
+    p_commission_rate numeric default 0.05
+)
+returns table (balance numeric, referrer_id bigint, commission numeric)
+language plpgsql
+as $$
+#variable_conflict use_column
+declare
+    v_balance numeric;
+    v_referrer bigint;
+    v_commission numeric := 0;
+begin
+    update users u
+       set balance = u.balance + p_reward
+     where u.user_id = p_user_id
+    returning u.balance into v_balance;
+    if not found then
+        return;
+    end if;
+
+    select rh.referrer_id into v_referrer
+      from referral_history rh
+     where rh.new_user_id = p_user_id
+     limit 1;
+
+    if v_referrer is not null then
+        v_commission := p_reward * p_commission_rate;
+        update users u
+           set balance = u.balance + v_commission
+         where u.user_id = v_referrer;
+    end if;
+
+    return query select v_balance, v_referrer, v_commission;
+end;
+$$;
+
+-- ============================================
+-- Daily bonus: check + credit + mark in ONE conditional update
+-- A double tap can only ever match once per p_today.
+-- ============================================
+create or replace function claim_daily_bonus(
+    p_user_id bigint,
+    p_amount numeric,
+    p_today date
+)
+returns table (claimed boolean, balance numeric)
+language plpgsql
+as $$
+#variable_conflict use_column
+declare
+    v_balance numeric;
+begin
+    update users u
+       set balance = u.balance + p_amount,
+           daily_bonus_date = p_today
+     where u.user_id = p_user_id
+       and (u.daily_bonus_date is null or left(u.daily_bonus_date::text, 10) <> p_today::text)
+    returning u.balance into v_balance;
+    if found then
+        return query select true, v_balance;
+        return;
+    end if;
+
+    -- Already claimed today (no row at all: unknown user)
+    return query
+    select false, u.balance::numeric from users u where u.user_id = p_user_id;
+end;
+$$;
+
+-- ============================================
+-- Referral: validate code + history row + referrer reward in ONE transaction
+-- ============================================
+
+-- One referrer per user, enforced by the database. Fails while duplicates
+-- left by the old multi-request flow remain - review and remove them with
+-- sql/referral_history_dedupe.sql first.
+create unique index if not exists referral_history_new_user_id_key
+    on referral_history (new_user_id);
+create index if not exists users_referral_code_idx on users (referral_code);
+
+-- status: ok | already_referred | self_referral | unknown_code
+-- p_referrer_id: the referrer when the bot already knows it (signed code,
+-- cached legacy code) - p_code is then only recorded, not looked up.
+drop function if exists apply_referral(bigint, text, numeric);
+create or replace function apply_referral(
+    p_new_user_id bigint,
+    p_code text,
+    p_reward numeric default 40,
+    p_referrer_id bigint default null
+)
+returns table (status text, referrer_id bigint, referrals integer, balance numeric)
+language plpgsql
+as $$
+#variable_conflict use_column
+declare
+    v_referrer bigint;
+    v_existing bigint;
+begin
+    if p_referrer_id is not null then
+        select u.user_id into v_referrer
+          from users u
+         where u.user_id = p_referrer_id;
+    else
+        select u.user_id into v_referrer
+          from users u
+         where u.referral_code = p_code
+         limit 1;
+    end if;
+    if v_referrer is null then
+        return query select 'unknown_code'::text, null::bigint, null::integer, null::numeric;
+        return;
+    end if;
+    if v_referrer = p_new_user_id then
+        return query select 'self_referral'::text, v_referrer, null::integer, null::numeric;
+        return;
+    end if;
+
+    insert into referral_history (new_user_id, referrer_id, referral_code, created_at)
+    values (p_new_user_id, v_referrer, p_code, current_date)
+    on conflict (new_user_id) do nothing;
+    if not found then
+        select rh.referrer_id into v_existing
+          from referral_history rh
+         where rh.new_user_id = p_new_user_id;
+        return query select 'already_referred'::text, v_existing, null::integer, null::numeric;
+        return;
+    end if;
+
+    return query
+    update users u
+       set balance = u.balance + p_reward,
+           referrals = coalesce(u.referrals, 0) + 1
+     where u.user_id = v_referrer
+    returning 'ok'::text, u.user_id::bigint, u.referrals::integer, u.balance::numeric;
+end;
+$$;
+
+-- ============================================
+-- Admin aggregates - one row back instead of every user's balance
+-- ============================================
+create or replace function users_balance_total()
+returns table (total_users bigint, total_balance numeric)
+language sql
+stable
+as $$
+    select count(*)::bigint, coalesce(sum(balance), 0)::numeric from users;
+$$;
@@ -0,0 +1,30 @@
+-- ============================================
+-- One-off migration: duplicate referral_history rows
+-- The old multi-request referral flow could record a new user twice.
+-- Run each step in the Supabase SQL editor BEFORE sql/functions.sql, which
+-- adds the unique index on referral_history(new_user_id).
+-- ============================================
+
+-- 1. Report: every new_user_id with more than one row, the row that is kept
+--    (lowest id) and the rows that step 2 deletes. Nothing is changed.
+select new_user_id,
+       count(*) as rows,
+       min(id) as kept_id,
+       (array_agg(id order by id))[2:] as deleted_ids,
+       array_agg(referrer_id order by id) as referrer_ids
+  from referral_history
+ group by new_user_id
+having count(*) > 1
+ order by new_user_id;
+
+-- 2. Delete the duplicates (keeps the oldest row of each new_user_id) and
+--    return the deleted rows. Save the output before committing.
+begin;
+
+delete from referral_history a
+ using referral_history b
+ where a.new_user_id = b.new_user_id
+   and a.id > b.id
+returning a.*;
+
+commit;
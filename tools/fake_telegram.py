@@ -0,0 +1,181 @@
+"""Local stand-in for Telegram, to drive the bot in webhook mode without the real API
+
+    # terminal 1 - fake Bot API on :8081, then push updates to the bot's webhook
+    python -m tools.fake_telegram --webhook http://127.0.0.1:8443/telegram --secret s3cret --updates 500
+
+    # terminal 2 - the bot, pointed at the fake API
+    BOT_MODE=webhook BOT_TOKEN=123:fake REFERRAL_SECRET=dev TELEGRAM_API_URL=http://127.0.0.1:8081/bot \\
+    WEBHOOK_URL=http://127.0.0.1:8443 WEBHOOK_SECRET=s3cret python main.py
+
+The fake API answers every Bot API method with a plausible result and records
+the calls, so the bot's replies can be inspected or counted.
+"""
+import json
+import time
+import asyncio
+import argparse
+import itertools
+from urllib.parse import parse_qsl
+
+import httpx
+
+from utils.webhook import MalformedRequest, read_request, write_response
+
+BOT_USER = {"id": 123, "is_bot": True, "first_name": "FakeBot", "username": "FakeBot"}
+
+
+def message_update(update_id: int, user_id: int, text: str) -> dict:
+    user = {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "username": f"user{user_id}"}
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private", "first_name": user["first_name"]},
+        "from": user,
+        "text": text
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": update_id, "message": message}
+
+
+def callback_update(update_id: int, user_id: int, data: str) -> dict:
+    update = message_update(update_id, user_id, "")
+    message = update.pop("message")
+    message["from"] = BOT_USER
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"},
+            "chat_instance": str(user_id),
+            "message": message,
+            "data": data
+        }
+    }
+
+
+def api_result(method: str, params: dict, message_id: int = 1):
+    """A plausible Bot API result for `method` called with `params`"""
+    if method == "getMe":
+        return BOT_USER
+    if method in ("sendMessage", "editMessageText"):
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": int(params.get("chat_id") or 0), "type": "private"},
+            "from": BOT_USER,
+            "text": str(params.get("text", ""))
+        }
+    return True
+
+
+class FakeBotAPI:
+    """Answers Bot API calls (POST /bot<token>/<method>) and records them"""
+
+    def __init__(self, listen: str = "127.0.0.1", port: int = 8081):
+        self.listen = listen
+        self.port = port
+        self.calls = []
+        self._message_ids = itertools.count(1)
+        self._server = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.listen, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def count(self, method: str) -> int:
+        return sum(1 for name, _ in self.calls if name == method)
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                _, path, headers, body = request
+                method = path.rsplit("/", 1)[-1]
+                if headers.get("content-type", "").startswith("application/json"):
+                    params = json.loads(body or b"{}")
+                else:
+                    params = dict(parse_qsl((body or b"").decode()))
+                self.calls.append((method, params))
+                result = api_result(method, params, next(self._message_ids))
+                payload = json.dumps({"ok": True, "result": result}).encode()
+                write_response(writer, 200, payload, "application/json")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, TimeoutError, MalformedRequest):
+            pass
+        finally:
+            writer.close()
+
+
+async def send_updates(webhook_url: str, secret: str, updates, connections: int = 40) -> dict:
+    """POST updates to the webhook like Telegram does -> status counts and latency"""
+    queue = asyncio.Queue()
+    for update in updates:
+        queue.put_nowait(update)
+    statuses = {}
+    latencies = []
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        async def worker():
+            while not queue.empty():
+                update = queue.get_nowait()
+                started = time.perf_counter()
+                response = await client.post(
+                    webhook_url, json=update,
+                    headers={"X-Telegram-Bot-Api-Secret-Token": secret}
+                )
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(connections)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "statuses": statuses,
+        "elapsed": elapsed,
+        "rate": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Fake Telegram: Bot API stub + webhook update sender")
+    parser.add_argument("--api-port", type=int, default=8081)
+    parser.add_argument("--webhook", help="bot webhook URL, e.g. http://127.0.0.1:8443/telegram")
+    parser.add_argument("--secret", default="")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--updates", type=int, default=1000)
+    parser.add_argument("--text", default="Balance 💳")
+    parser.add_argument("--connections", type=int, default=40)
+    parser.add_argument("--wait", type=float, default=5.0, help="seconds to keep the API up afterwards")
+    args = parser.parse_args()
+
+    api = FakeBotAPI(port=args.api_port)
+    await api.start()
+    print(f"🤖 Fake Bot API on http://127.0.0.1:{api.port}/bot")
+
+    if args.webhook:
+        await asyncio.sleep(1)
+        updates = (message_update(i, 1000 + i % args.users, args.text) for i in range(1, args.updates + 1))
+        result = await send_updates(args.webhook, args.secret, updates, args.connections)
+        print(json.dumps(result, indent=2))
+        await asyncio.sleep(args.wait)
+        print(f"📤 Bot made {len(api.calls)} API calls ({api.count('sendMessage')} sendMessage)")
+    else:
+        await asyncio.Event().wait()
+    await api.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,198 @@
+import os
+import json
+import uuid
+import asyncio
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+
+class BalanceAccumulator:
+    """Write-behind buffer for balance credits
+
+    Credits are coalesced per user and flushed in bulk every `flush_ms`
+    milliseconds or once `max_entries` credits are waiting, whichever comes
+    first. Every credit is appended to a local journal before it is
+    acknowledged, so a crash never loses money:
+
+        {"u": user_id, "a": amount}          credit waiting for a flush
+        {"batch": id, "deltas": {...}}       credits handed to the database
+        {"done": id}                         batch confirmed by the database
+
+    Batches carry an id and the server applies each id only once, so a batch
+    that is replayed after a crash is never credited twice.
+
+    Journal lines are written off the event loop in groups: credits that
+    arrive while a write is running share the next write (group commit).
+    """
+
+    def __init__(self, flush_fn, journal_path: str, flush_ms: int = 500, max_entries: int = 500):
+        self.flush_fn = flush_fn
+        self.journal_path = journal_path
+        self.flush_interval = flush_ms / 1000
+        self.max_entries = max_entries
+
+        self.pending = defaultdict(float)  # user_id -> amount not yet flushed
+        self.in_flight = {}                # batch_id -> {user_id: amount}
+        self.entries = 0
+
+        self._journal = None
+        self._lines = []                   # journal lines not written yet
+        self._journal_lock = asyncio.Lock()
+        # One thread - journal writes run in order even if an awaiting task is cancelled
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="balance-journal")
+        self._wake = asyncio.Event()
+        self._task = None
+        self._flush_lock = asyncio.Lock()
+
+    # ============================================
+    # PUBLIC API
+    # ============================================
+
+    async def add(self, user_id: int, amount: float) -> None:
+        """Queue a credit (journaled before returning)"""
+        self._write({"u": user_id, "a": amount})
+        self.pending[user_id] += amount
+        self.entries += 1
+        if self.entries >= self.max_entries:
+            self._wake.set()
+        await self._sync()
+
+    def pending_for(self, user_id: int) -> float:
+        """Amount credited to user_id that the database does not show yet"""
+        amount = self.pending.get(user_id, 0.0)
+        for deltas in self.in_flight.values():
+            amount += deltas.get(user_id, 0.0)
+        return amount
+
+    async def start(self) -> None:
+        """Replay the journal and start the background flusher"""
+        self._replay()
+        self._compact()
+        if self.in_flight or self.pending:
+            log.info("balance_journal_replay", batches=len(self.in_flight), users=len(self.pending))
+            await self.flush()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Flush everything and close the journal"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        await self._sync()
+        if self._journal:
+            self._journal.close()
+            self._journal = None
+
+    async def flush(self) -> None:
+        """Send waiting credits (and any unconfirmed batches) to the database"""
+        async with self._flush_lock:
+            if not self.pending and not self.in_flight:
+                return
+
+            if self.pending:
+                batch_id = uuid.uuid4().hex
+                deltas = dict(self.pending)
+                self.pending = defaultdict(float)
+                self.entries = 0
+                self.in_flight[batch_id] = deltas
+                self._write({"batch": batch_id, "deltas": deltas})
+                await self._sync(fsync=True)
+
+            for batch_id, deltas in list(self.in_flight.items()):
+                try:
+                    await self.flush_fn(batch_id, deltas)
+                except Exception as e:
+                    # Kept in flight - retried with the same id on the next tick
+                    log.warning("balance_flush_failed", batch_id=batch_id, users=len(deltas), error=str(e))
+                    continue
+                del self.in_flight[batch_id]
+                self._write({"done": batch_id})
+
+            async with self._journal_lock:
+                # The snapshot covers every queued line - they are not written separately
+                snapshot = self._snapshot()
+                await asyncio.get_running_loop().run_in_executor(self._io, self._rewrite, snapshot)
+
+    # ============================================
+    # INTERNALS
+    # ============================================
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def _write(self, record: dict):
+        """Queue a journal line - written by the next _sync()"""
+        self._lines.append(json.dumps(record) + "\n")
+
+    async def _sync(self, fsync: bool = False):
+        """Write the queued journal lines in one go, in a worker thread"""
+        async with self._journal_lock:
+            # Lines queued while an earlier write ran (ours included) go out together
+            lines, self._lines = self._lines, []
+            if lines:
+                await asyncio.get_running_loop().run_in_executor(self._io, self._append, lines, fsync)
+
+    def _append(self, lines, fsync: bool):
+        if self._journal is None:
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._journal.writelines(lines)
+        # flush() survives a process crash, fsync() also survives power loss
+        self._journal.flush()
+        if fsync:
+            os.fsync(self._journal.fileno())
+
+    def _replay(self):
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn last line from a crash mid-write
+                if "u" in record:
+                    self.pending[int(record["u"])] += float(record["a"])
+                elif "batch" in record:
+                    # The batch took every credit that was pending at the time
+                    self.in_flight[record["batch"]] = {int(k): float(v) for k, v in record["deltas"].items()}
+                    self.pending = defaultdict(float)
+                elif "done" in record:
+                    self.in_flight.pop(record["done"], None)
+        self.entries = len(self.pending)
+
+    def _compact(self):
+        """Rewrite the journal with only the state that still matters"""
+        self._rewrite(self._snapshot())
+
+    def _snapshot(self) -> list:
+        """Journal lines for the current state - replaces the queued ones"""
+        self._lines = []
+        lines = [json.dumps({"batch": batch_id, "deltas": deltas}) + "\n"
+                 for batch_id, deltas in self.in_flight.items()]
+        lines.extend(json.dumps({"u": user_id, "a": amount}) + "\n" for user_id, amount in self.pending.items())
+        return lines
+
+    def _rewrite(self, lines):
+        if self._journal:
+            self._journal.close()
+            self._journal = None
+        tmp_path = self.journal_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.journal_path)
@@ -0,0 +1,146 @@
+import os
+import json
+import sqlite3
+from array import array
+from datetime import datetime
+
+BROADCAST_DB_PATH = os.getenv("BROADCAST_DB_PATH", "broadcasts.sqlite3")
+
+# running   - being sent (or interrupted by a restart)
+# paused    - interrupted, waiting for /broadcast resume
+# cancelled - stopped by /broadcast cancel
+# done      - every recipient handled
+ACTIVE_STATUSES = ("running", "paused")
+
+
+class BroadcastStore:
+    """Local SQLite store for broadcast jobs and their checkpoints
+
+    A job's cursor is a user_id watermark: every recipient with an id <= cursor
+    has been handled. Ids above the cursor that were already handled when the
+    checkpoint was taken are kept in done_above, so a resumed job skips them.
+
+    Recipients that failed permanently (blocked the bot, chat gone) are kept
+    in failed_recipients for /cleanup, across restarts.
+    """
+
+    def __init__(self, path: str = BROADCAST_DB_PATH):
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS broadcast_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                admin_id INTEGER NOT NULL,
+                message TEXT NOT NULL,
+                active_since TEXT,
+                status TEXT NOT NULL DEFAULT 'running',
+                cursor INTEGER,
+                done_above TEXT NOT NULL DEFAULT '[]',
+                total INTEGER NOT NULL DEFAULT 0,
+                sent INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                flood_waits INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS failed_recipients (
+                user_id INTEGER PRIMARY KEY,
+                reason TEXT,
+                failed_at TEXT NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self.conn.commit()
+        # Mirror of failed_recipients so forget_failed() is free for everyone else
+        self._data_version = None
+        self._sync()
+
+    def _sync(self):
+        """Reload the failure mirror if another process (shard) committed since"""
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._data_version:
+            self._data_version = version
+            self._failed = set(row[0] for row in self.conn.execute("SELECT user_id FROM failed_recipients"))
+
+    def _job(self, row):
+        if row is None:
+            return None
+        job = dict(row)
+        job["done_above"] = json.loads(job["done_above"])
+        return job
+
+    def create_job(self, admin_id: int, message: str, active_since: str = None) -> dict:
+        now = datetime.now().isoformat()
+        cur = self.conn.execute(
+            "INSERT INTO broadcast_jobs (admin_id, message, active_since, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (admin_id, message, active_since, now, now)
+        )
+        self.conn.commit()
+        return self.get_job(cur.lastrowid)
+
+    def get_job(self, job_id: int) -> dict:
+        return self._job(self.conn.execute("SELECT * FROM broadcast_jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def active_job(self) -> dict:
+        """Latest job that is running or paused"""
+        return self._job(self.conn.execute(
+            "SELECT * FROM broadcast_jobs WHERE status IN (?, ?) ORDER BY id DESC LIMIT 1",
+            ACTIVE_STATUSES
+        ).fetchone())
+
+    def checkpoint(self, job_id: int, cursor: int, done_above: list, stats: dict,
+                   failed: list = (), recovered: list = ()) -> None:
+        """Save progress and the failure set changes since the last checkpoint (one transaction)"""
+        now = datetime.now().isoformat()
+        with self.conn:
+            self.conn.execute(
+                "UPDATE broadcast_jobs SET cursor = ?, done_above = ?, total = ?, sent = ?, failed = ?, "
+                "flood_waits = ?, updated_at = ? WHERE id = ?",
+                (cursor, json.dumps(done_above), stats["total"], stats["sent"], stats["failed"],
+                 stats["flood_waits"], now, job_id)
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO failed_recipients (user_id, reason, failed_at) VALUES (?, ?, ?)",
+                [(user_id, reason, now) for user_id, reason in failed]
+            )
+            self.conn.executemany("DELETE FROM failed_recipients WHERE user_id = ?", [(i,) for i in recovered])
+        self._failed.update(user_id for user_id, _ in failed)
+        self._failed.difference_update(recovered)
+
+    def set_status(self, job_id: int, status: str) -> None:
+        self.conn.execute(
+            "UPDATE broadcast_jobs SET status = ?, updated_at = ? WHERE id = ?",
+            (status, datetime.now().isoformat(), job_id)
+        )
+        self.conn.commit()
+
+    # ============================================
+    # PERMANENT FAILURES (for /cleanup)
+    # ============================================
+
+    def is_failed(self, user_id: int) -> bool:
+        self._sync()
+        return user_id in self._failed
+
+    def failed_count(self) -> int:
+        self._sync()
+        return len(self._failed)
+
+    def failed_ids(self) -> array:
+        self._sync()
+        return array('q', sorted(self._failed))
+
+    def forget_failed(self, user_ids) -> None:
+        """Drop ids from the failure set (deleted, or reachable again)"""
+        self._sync()
+        doomed = [i for i in user_ids if i in self._failed]
+        if not doomed:
+            return
+        with self.conn:
+            self.conn.executemany("DELETE FROM failed_recipients WHERE user_id = ?", [(i,) for i in doomed])
+        self._failed.difference_update(doomed)
+
+
+broadcast_store = BroadcastStore()
@@ -0,0 +1,290 @@
+import os
+import time
+import asyncio
+import httpx
+from array import array
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
+
+# Telegram allows ~30 messages/second per bot overall and ~1/second per chat
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "28"))
+BROADCAST_WORKERS = int(os.getenv("BROADCAST_WORKERS", "20"))
+BROADCAST_PROGRESS_SECONDS = float(os.getenv("BROADCAST_PROGRESS_SECONDS", "15"))
+BROADCAST_CHECKPOINT_EVERY = int(os.getenv("BROADCAST_CHECKPOINT_EVERY", "100"))
+BROADCAST_MAX_RETRIES = int(os.getenv("BROADCAST_MAX_RETRIES", "3"))
+PER_CHAT_INTERVAL = 1.0
+
+# Delivery outcomes
+PERMANENT = "permanent"        # blocked the bot / chat gone - safe to clean up
+RATE_LIMITED = "rate_limited"  # RetryAfter - wait and retry
+TRANSIENT = "transient"        # network errors before the request went out - retry inline
+UNCERTAIN = "uncertain"        # timed out after sending - may have arrived, never resent
+OTHER = "other"                # e.g. a bad message - counted, never cleaned up
+
+# BadRequest texts that mean the chat can never be reached
+PERMANENT_BAD_REQUESTS = ("chat not found", "user is deactivated", "peer_id_invalid", "bot was blocked")
+
+
+def classify_error(error: Exception) -> str:
+    """Sort a send_message exception into one of the delivery outcomes"""
+    if isinstance(error, RetryAfter):
+        return RATE_LIMITED
+    if isinstance(error, Forbidden):
+        return PERMANENT
+    # BadRequest and TimedOut subclass NetworkError in PTB - check them first
+    if isinstance(error, BadRequest):
+        text = str(error).lower()
+        return PERMANENT if any(t in text for t in PERMANENT_BAD_REQUESTS) else OTHER
+    if isinstance(error, TimedOut):
+        # Connect and pool timeouts fire before the request is sent; a read or
+        # write timeout may come after Telegram already delivered the message
+        if isinstance(error.__cause__, (httpx.ConnectTimeout, httpx.PoolTimeout)):
+            return TRANSIENT
+        return UNCERTAIN
+    if isinstance(error, NetworkError):
+        return TRANSIENT
+    return OTHER
+
+
+class TokenBucket:
+    """Async token bucket with an adjustable rate and a global pause"""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for `seconds` (Telegram RetryAfter)"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class Broadcaster:
+    """Send one message to many chats with a pool of workers
+
+    All workers share one token bucket tuned below Telegram's global limit.
+    On RetryAfter the whole pool pauses for the requested time, the rate is
+    cut by 20% and the chat is retried. The rate climbs back to `max_rate`
+    after a run of clean sends. Transient errors are retried inline with
+    backoff; a send that timed out after the request went out is counted as
+    uncertain and not retried, so nobody gets the message twice. Only
+    permanent failures end up in `failed`.
+
+    Recipients must arrive in increasing id order (db.iter_user_ids). Every
+    `checkpoint_every` handled recipients on_checkpoint(cursor, done_above,
+    stats, failed, recovered) is awaited: every id <= cursor is handled, plus
+    the ids listed in done_above. failed lists (user_id, reason) permanent
+    failures since the last checkpoint, recovered the ids that `is_failed`
+    flagged from an earlier broadcast but were delivered to this time. A
+    job resumed with start_cursor/skip continues from there.
+    """
+
+    def __init__(self, bot, message: str, workers: int = BROADCAST_WORKERS,
+                 max_rate: float = BROADCAST_RATE, parse_mode: str = 'HTML',
+                 start_cursor: int = None, skip=(), counts: dict = None, is_failed=None,
+                 on_checkpoint=None, checkpoint_every: int = BROADCAST_CHECKPOINT_EVERY):
+        self.bot = bot
+        self.message = message
+        self.workers = workers
+        self.max_rate = max_rate
+        self.parse_mode = parse_mode
+        self.bucket = TokenBucket(max_rate)
+
+        counts = counts or {}
+        self.total = counts.get("total", 0)
+        self.sent = counts.get("sent", 0)
+        self.failed_before = counts.get("failed", 0)
+        self.failed = array('q')  # permanent failures of this run
+        self.outcomes = {PERMANENT: 0, TRANSIENT: 0, UNCERTAIN: 0, OTHER: 0}
+        self.retries = 0
+        self.flood_waits = counts.get("flood_waits", 0)
+        self.started = None
+        self.cancelled = False
+        self._clean_streak = 0
+
+        self.on_checkpoint = on_checkpoint
+        self.checkpoint_every = checkpoint_every
+        self._skip = set(skip)
+        self._last_enqueued = start_cursor
+        self._pending = set()    # enqueued, not handled yet
+        # handled, above the last checkpoint cursor - a resumed job starts with its skip ids
+        self._done_above = set(self._skip)
+        self._since_checkpoint = 0
+        self._sent_at_start = self.sent
+        self._is_failed = is_failed
+        self._new_failed = []
+        self._recovered = []
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started if self.started else 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Delivered messages per second in this run"""
+        return (self.sent - self._sent_at_start) / self.elapsed if self.elapsed else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "total": self.total,
+            "sent": self.sent,
+            "failed": self.failed_before + sum(self.outcomes.values()),
+            "permanent": self.outcomes[PERMANENT],
+            "transient": self.outcomes[TRANSIENT],
+            "uncertain": self.outcomes[UNCERTAIN],
+            "other": self.outcomes[OTHER],
+            "retries": self.retries,
+            "flood_waits": self.flood_waits,
+            "rate_limit": self.bucket.rate,
+            "throughput": self.throughput,
+            "elapsed": self.elapsed
+        }
+
+    def cancel(self) -> None:
+        """Stop after the messages already being sent"""
+        self.cancelled = True
+
+    def checkpoint_state(self):
+        """(cursor, done_above) - every id <= cursor plus done_above is handled"""
+        cursor = min(self._pending) - 1 if self._pending else self._last_enqueued
+        if cursor is not None:
+            self._done_above = {i for i in self._done_above if i > cursor}
+        return cursor, sorted(self._done_above)
+
+    async def run(self, user_pages, on_progress=None, progress_every: float = 15.0) -> dict:
+        """Deliver to every id from the async page iterator, returns stats()
+
+        An exception from the iterator is re-raised once the recipients
+        already queued are handled and checkpointed.
+        """
+        self.started = time.monotonic()
+        self._sent_at_start = self.sent
+        queue = asyncio.Queue(maxsize=self.workers * 4)
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(self.workers)]
+        reporter = asyncio.create_task(self._report(on_progress, progress_every)) if on_progress else None
+        try:
+            try:
+                async for page in user_pages:
+                    for user_id in page:
+                        if self.cancelled:
+                            break
+                        if user_id in self._skip:
+                            continue
+                        self.total += 1
+                        self._pending.add(user_id)
+                        self._last_enqueued = user_id
+                        await queue.put(user_id)
+                    if self.cancelled:
+                        break
+            except Exception:
+                # The recipient scan failed - finish and checkpoint what is queued, then report
+                await queue.join()
+                await self._checkpoint()
+                raise
+            await queue.join()
+            await self._checkpoint()
+        finally:
+            for task in workers:
+                task.cancel()
+            if reporter:
+                reporter.cancel()
+            await asyncio.gather(*workers, *([reporter] if reporter else []), return_exceptions=True)
+        return self.stats()
+
+    async def _worker(self, queue):
+        while True:
+            user_id = await queue.get()
+            try:
+                if not self.cancelled:
+                    await self._deliver(user_id)
+                    self._pending.discard(user_id)
+                    self._done_above.add(user_id)
+                    self._since_checkpoint += 1
+                    if self._since_checkpoint >= self.checkpoint_every:
+                        await self._checkpoint()
+            finally:
+                queue.task_done()
+
+    async def _checkpoint(self):
+        self._since_checkpoint = 0
+        if self.on_checkpoint is None:
+            return
+        cursor, done_above = self.checkpoint_state()
+        stats = self.stats()
+        # Queued-but-unsent recipients are counted again when a job resumes
+        stats["total"] = stats["sent"] + stats["failed"]
+        failed, self._new_failed = self._new_failed, []
+        recovered, self._recovered = self._recovered, []
+        try:
+            await self.on_checkpoint(cursor, done_above, stats, failed, recovered)
+        except Exception:
+            # Keep them for the next checkpoint
+            self._new_failed = failed + self._new_failed
+            self._recovered = recovered + self._recovered
+
+    async def _deliver(self, user_id: int):
+        attempt = 0
+        while True:
+            await self.bucket.acquire()
+            try:
+                await self.bot.send_message(chat_id=user_id, text=self.message, parse_mode=self.parse_mode)
+            except Exception as e:
+                outcome = classify_error(e)
+                if outcome == RATE_LIMITED:
+                    self._on_flood(float(e.retry_after))
+                    await asyncio.sleep(max(float(e.retry_after), PER_CHAT_INTERVAL))
+                    continue
+                if outcome == TRANSIENT and attempt < BROADCAST_MAX_RETRIES:
+                    attempt += 1
+                    self.retries += 1
+                    await asyncio.sleep(PER_CHAT_INTERVAL * 2 ** (attempt - 1))
+                    continue
+                self.outcomes[outcome] += 1
+                if outcome == PERMANENT:
+                    self.failed.append(user_id)
+                    self._new_failed.append((user_id, str(e)[:100]))
+                return
+            self.sent += 1
+            if self._is_failed and self._is_failed(user_id):
+                self._recovered.append(user_id)
+            self._on_success()
+            return
+
+    def _on_flood(self, retry_after: float):
+        self.flood_waits += 1
+        self._clean_streak = 0
+        # Workers in flight hit the same flood wait - slow down once per wait
+        if time.monotonic() >= self.bucket.paused_until:
+            self.bucket.rate = max(1.0, self.bucket.rate * 0.8)
+        self.bucket.pause(retry_after)
+
+    def _on_success(self):
+        self._clean_streak += 1
+        if self._clean_streak >= 500 and self.bucket.rate < self.max_rate:
+            self.bucket.rate = min(self.max_rate, self.bucket.rate + 1)
+            self._clean_streak = 0
+
+    async def _report(self, on_progress, every: float):
+        while True:
+            await asyncio.sleep(every)
+            try:
+                await on_progress(self.stats())
+            except Exception:
+                pass
@@ -0,0 +1,75 @@
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Bounded read-through cache with TTL expiry and LRU eviction
+
+    Reads that race a write are handled with tokens: take token() before the
+    database read and pass it to put(); if the key was invalidated while the
+    read was in flight the (possibly stale) value is dropped instead of cached.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._data = OrderedDict()         # key -> (expires_at, value)
+        self._invalidated = OrderedDict()  # key -> seq of its last invalidation
+        self._seq = 0
+        self._floor = 0                    # newest seq forgotten from _invalidated
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def token(self) -> int:
+        return self._seq
+
+    def put(self, key, value, token: int = None) -> None:
+        if token is not None and (token < self._floor or self._invalidated.get(key, 0) > token):
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key) -> None:
+        self._seq += 1
+        self._data.pop(key, None)
+        self._invalidated[key] = self._seq
+        self._invalidated.move_to_end(key)
+        if len(self._invalidated) > self.maxsize:
+            _, seq = self._invalidated.popitem(last=False)
+            self._floor = max(self._floor, seq)
+
+    def clear(self) -> None:
+        self._seq += 1
+        self._floor = self._seq
+        self._data.clear()
+        self._invalidated.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / total) if total else 0.0
+        }
@@ -0,0 +1,79 @@
+import os
+import httpx
+from postgrest import AsyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
+
+# Connection pool shared by every PostgREST request of the process
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "20"))
+DB_MAX_KEEPALIVE = int(os.getenv("DB_MAX_KEEPALIVE", str(DB_MAX_CONNECTIONS)))
+DB_KEEPALIVE_EXPIRY = float(os.getenv("DB_KEEPALIVE_EXPIRY", "60"))  # idle seconds before closing
+DB_HTTP2 = os.getenv("DB_HTTP2", "1") == "1"  # many requests multiplexed on one connection
+# Seconds. postgrest's default is 120 s for everything - a stalled socket held
+# a handler (and its user lock) for two minutes.
+DB_CONNECT_TIMEOUT = float(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+DB_TIMEOUT = float(os.getenv("DB_TIMEOUT", "10"))  # read / write
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))  # waiting for a free connection
+# Connections opened by SupabaseDB.init_table() (one is enough with HTTP/2)
+DB_WARMUP_CONNECTIONS = int(os.getenv("DB_WARMUP_CONNECTIONS", "4"))
+
+
+def pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=DB_MAX_CONNECTIONS,
+        max_keepalive_connections=DB_MAX_KEEPALIVE,
+        keepalive_expiry=DB_KEEPALIVE_EXPIRY
+    )
+
+
+def pool_timeout() -> httpx.Timeout:
+    return httpx.Timeout(DB_TIMEOUT, connect=DB_CONNECT_TIMEOUT, pool=DB_POOL_TIMEOUT)
+
+
+def warmup_connections() -> int:
+    return 1 if DB_HTTP2 else max(1, min(DB_WARMUP_CONNECTIONS, DB_MAX_CONNECTIONS))
+
+
+class PooledPostgrestClient(AsyncPostgrestClient):
+    """PostgREST client on an explicitly configured httpx pool"""
+
+    def create_session(self, base_url, headers, timeout, verify=True):
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=pool_timeout(),
+            limits=pool_limits(),
+            verify=verify,
+            follow_redirects=True,
+            http2=DB_HTTP2
+        )
+
+
+def create_postgrest_client(supabase_url: str, supabase_key: str) -> PooledPostgrestClient:
+    """What supabase.acreate_client() would build for table()/rpc(), minus auth/storage"""
+    headers = {
+        **DEFAULT_POSTGREST_CLIENT_HEADERS,
+        "apiKey": supabase_key,
+        "Authorization": f"Bearer {supabase_key}"
+    }
+    return PooledPostgrestClient(f"{supabase_url}/rest/v1", headers=headers)
+
+
+def pool_stats(session: httpx.AsyncClient) -> dict:
+    """Connections of the pool behind `session` and requests waiting for one
+
+    Reads httpcore's pool state (not a public API); empty when the
+    transport is not a plain httpcore pool.
+    """
+    pool = getattr(getattr(session, "_transport", None), "_pool", None)
+    if pool is None:
+        return {}
+    connections = pool.connections
+    idle = sum(1 for c in connections if c.is_idle())
+    queued = sum(1 for r in getattr(pool, "_requests", ()) if r.is_queued())
+    return {
+        "max_connections": DB_MAX_CONNECTIONS,
+        "connections": len(connections),
+        "idle": idle,
+        "busy": len(connections) - idle,
+        "queued": queued
+    }
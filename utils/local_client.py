@@ -0,0 +1,497 @@
+import asyncio
+import itertools
+from contextlib import nullcontext
+from datetime import date, datetime, timezone
+from collections import defaultdict, namedtuple
+
+# key: primary key columns, serial: key is an auto-assigned integer id,
+# defaults: column -> callable for columns the insert leaves out,
+# unique: further unique constraints, indexes: plain (non-unique) indexes
+TableSpec = namedtuple("TableSpec", "key columns defaults indexes serial unique", defaults=((),))
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+# The tables SupabaseDB touches, as created in the Supabase project.
+# bot_stats.total_users is maintained by an AFTER INSERT trigger on users
+# (never decremented on delete) - both local clients emulate it.
+TABLES = {
+    "users": TableSpec(
+        key=("user_id",),
+        columns={"user_id": "INTEGER", "username": "TEXT", "balance": "REAL", "referrals": "INTEGER",
+                 "referral_code": "TEXT", "daily_bonus_date": "TEXT", "created_at": "TEXT"},
+        defaults={"balance": lambda: 0.0, "referrals": lambda: 0, "created_at": _now},
+        indexes=(("referral_code",), ("created_at",)),
+        serial=False,
+    ),
+    "referral_history": TableSpec(
+        key=("id",),
+        columns={"id": "INTEGER", "new_user_id": "INTEGER", "referrer_id": "INTEGER",
+                 "referral_code": "TEXT", "created_at": "TEXT"},
+        defaults={"created_at": _now},
+        indexes=(("referrer_id",),),
+        serial=True,
+        # One referrer per user (sql/functions.sql)
+        unique=(("new_user_id",),),
+    ),
+    "daily_tasks": TableSpec(
+        key=("user_id", "task_date"),
+        columns={"user_id": "INTEGER", "task_date": "TEXT", "tasks_completed": "INTEGER",
+                 "pending_reward": "REAL", "last_task_time": "TEXT"},
+        defaults={"tasks_completed": lambda: 0, "pending_reward": lambda: 0.0},
+        indexes=(),
+        serial=False,
+    ),
+    "daily_task_codes": TableSpec(
+        key=("id",),
+        columns={"id": "INTEGER", "task_number": "INTEGER", "secret_code": "TEXT", "created_date": "TEXT"},
+        defaults={},
+        indexes=(("created_date", "secret_code"),),
+        serial=True,
+    ),
+    "task_code_usage": TableSpec(
+        key=("id",),
+        columns={"id": "INTEGER", "code_id": "INTEGER", "user_id": "INTEGER", "used_date": "TEXT"},
+        defaults={},
+        indexes=(("code_id", "user_id"),),
+        serial=True,
+    ),
+    "bot_stats": TableSpec(
+        key=("id",),
+        columns={"id": "INTEGER", "total_users": "INTEGER"},
+        defaults={"total_users": lambda: 0},
+        indexes=(),
+        serial=False,
+    ),
+    # sql/functions.sql
+    "balance_batches": TableSpec(
+        key=("batch_id",),
+        columns={"batch_id": "TEXT", "applied_at": "TEXT"},
+        defaults={"applied_at": _now},
+        indexes=(),
+        serial=False,
+    ),
+}
+
+
+class LocalAPIError(Exception):
+    """Raised where PostgREST would answer with an error (e.g. a duplicate key)"""
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+class LocalResponse:
+    """Same shape as the postgrest APIResponse (data + count)"""
+
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class LocalQuery:
+    """Tiny subset of the postgrest query builder used by SupabaseDB"""
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.op = "select"
+        self.columns = "*"
+        self.payload = None
+        self.filters = []  # (column, op, value)
+        self.order_by = None
+        self.order_desc = False
+        self.limit_n = None
+        self.offset = 0
+        self.count = None
+        self.on_conflict = ""
+
+    # ---- operations ----
+    def select(self, *columns, count=None):
+        self.columns = ",".join(columns) if columns else "*"
+        self.count = count
+        return self
+
+    def insert(self, rows):
+        self.op, self.payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict=""):
+        self.op, self.payload, self.on_conflict = "upsert", rows, on_conflict
+        return self
+
+    def update(self, values):
+        self.op, self.payload = "update", values
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    # ---- filters ----
+    def eq(self, column, value):
+        self.filters.append((column, "eq", value))
+        return self
+
+    def neq(self, column, value):
+        self.filters.append((column, "neq", value))
+        return self
+
+    def gt(self, column, value):
+        self.filters.append((column, "gt", value))
+        return self
+
+    def gte(self, column, value):
+        self.filters.append((column, "gte", value))
+        return self
+
+    def lt(self, column, value):
+        self.filters.append((column, "lt", value))
+        return self
+
+    def lte(self, column, value):
+        self.filters.append((column, "lte", value))
+        return self
+
+    def in_(self, column, values):
+        self.filters.append((column, "in", frozenset(values)))
+        return self
+
+    # ---- modifiers ----
+    def order(self, column, desc=False):
+        self.order_by, self.order_desc = column, desc
+        return self
+
+    def limit(self, n):
+        self.limit_n = n
+        return self
+
+    def range(self, start, end):
+        self.offset, self.limit_n = start, end - start + 1
+        return self
+
+    # ---- helpers for the backends ----
+    @property
+    def rows(self):
+        """Insert/upsert payload as a list of rows"""
+        return self.payload if isinstance(self.payload, list) else [self.payload]
+
+    @property
+    def conflict_keys(self):
+        keys = tuple(k.strip() for k in self.on_conflict.split(",") if k.strip())
+        return keys or TABLES[self.table].key
+
+    async def execute(self):
+        return await self.client.run(self)
+
+
+class LocalRPC:
+    def __init__(self, client, fn, params):
+        self.client = client
+        self.fn = fn
+        self.params = params
+
+    async def execute(self):
+        return await self.client.call(self.fn, self.params)
+
+
+class LocalClient:
+    """Offline stand-in for the Supabase client (DB_BACKEND=memory|sqlite)
+
+    Mirrors the table()/rpc() surface SupabaseDB uses and the server-side
+    functions from sql/functions.sql, so the same SupabaseDB code runs
+    against it unchanged. Subclasses store the rows (_run) and may make
+    an RPC all-or-nothing (_transaction); the functions themselves are
+    written once here on top of _run.
+    """
+
+    def __init__(self):
+        # One writer at a time - stands in for the row locks of the real DB
+        self._lock = asyncio.Lock()
+
+    def table(self, name):
+        if name not in TABLES:
+            raise LocalAPIError(f'relation "{name}" does not exist', "42P01")
+        return LocalQuery(self, name)
+
+    def rpc(self, fn, params):
+        return LocalRPC(self, fn, params)
+
+    def close(self) -> None:
+        pass
+
+    def load(self, table, rows) -> None:
+        """Insert rows directly (seeding tests and benchmarks)"""
+        self._run(self.table(table).insert(list(rows)))
+
+    @staticmethod
+    def _with_defaults(table, row):
+        """row with every column present, like the row Postgres would return"""
+        spec = TABLES[table]
+        unknown = set(row) - set(spec.columns)
+        if unknown:
+            raise LocalAPIError(f"Could not find the '{sorted(unknown)[0]}' column of '{table}'", "PGRST204")
+        full = {column: None for column in spec.columns}
+        full.update({column: default() for column, default in spec.defaults.items()})
+        full.update(row)
+        return full
+
+    # ============================================
+    # QUERY EXECUTION
+    # ============================================
+
+    async def run(self, query):
+        async with self._lock:
+            return await self._execute(self._run, query)
+
+    async def _execute(self, fn, *args):
+        """Run fn(*args) - inline here, subclasses may move it off the event loop"""
+        return fn(*args)
+
+    def _run(self, query):
+        raise NotImplementedError
+
+    def _transaction(self):
+        return nullcontext()
+
+    def _one(self, table, **where):
+        query = self.table(table).select("*")
+        for column, value in where.items():
+            query.eq(column, value)
+        rows = self._run(query.limit(1)).data
+        return rows[0] if rows else None
+
+    # ============================================
+    # SERVER-SIDE FUNCTIONS (sql/functions.sql)
+    # ============================================
+
+    async def call(self, fn, params):
+        handler = getattr(self, f"_rpc_{fn}", None)
+        if handler is None:
+            raise LocalAPIError(f"Could not find the function public.{fn}", "PGRST202")
+        async with self._lock:
+            return await self._execute(self._call, handler, params)
+
+    def _call(self, handler, params):
+        with self._transaction():
+            return LocalResponse(handler(**params))
+
+    def _credit(self, user, amount, referrals=0):
+        values = {"balance": float(user.get("balance") or 0) + float(amount)}
+        if referrals:
+            values["referrals"] = int(user.get("referrals") or 0) + int(referrals)
+        return self._run(self.table("users").update(values).eq("user_id", user["user_id"])).data[0]
+
+    def _rpc_increment_balance(self, p_user_id, p_amount, p_referrals=0):
+        user = self._one("users", user_id=p_user_id)
+        if user is None:
+            return []
+        user = self._credit(user, p_amount, p_referrals)
+        return [{"balance": user["balance"], "referrals": int(user.get("referrals") or 0)}]
+
+    def _rpc_credit_ad_reward(self, p_user_id, p_reward, p_commission_rate=0.05):
+        user = self._one("users", user_id=p_user_id)
+        if user is None:
+            return []
+        user = self._credit(user, p_reward)
+        history = self._one("referral_history", new_user_id=p_user_id)
+        referrer_id, commission = None, 0.0
+        if history is not None:
+            referrer_id = history["referrer_id"]
+            commission = float(p_reward) * float(p_commission_rate)
+            referrer = self._one("users", user_id=referrer_id)
+            if referrer is not None:
+                self._credit(referrer, commission)
+        return [{"balance": user["balance"], "referrer_id": referrer_id, "commission": commission}]
+
+    def _rpc_claim_daily_bonus(self, p_user_id, p_amount, p_today):
+        user = self._one("users", user_id=p_user_id)
+        if user is None:
+            return []
+        if (user.get("daily_bonus_date") or "")[:10] == p_today:
+            return [{"claimed": False, "balance": user["balance"]}]
+        user = self._credit(user, p_amount)
+        self._run(self.table("users").update({"daily_bonus_date": p_today}).eq("user_id", p_user_id))
+        return [{"claimed": True, "balance": user["balance"]}]
+
+    def _rpc_apply_referral(self, p_new_user_id, p_code, p_reward=40, p_referrer_id=None):
+        if p_referrer_id is not None:
+            referrer = self._one("users", user_id=p_referrer_id)
+        else:
+            referrer = self._one("users", referral_code=p_code)
+        if referrer is None:
+            return [{"status": "unknown_code", "referrer_id": None, "referrals": None, "balance": None}]
+        if referrer["user_id"] == p_new_user_id:
+            return [{"status": "self_referral", "referrer_id": p_new_user_id, "referrals": None, "balance": None}]
+        history = self._one("referral_history", new_user_id=p_new_user_id)
+        if history is not None:
+            return [{"status": "already_referred", "referrer_id": history["referrer_id"],
+                     "referrals": None, "balance": None}]
+        self._run(self.table("referral_history").insert({
+            "new_user_id": p_new_user_id,
+            "referrer_id": referrer["user_id"],
+            "referral_code": p_code,
+            "created_at": date.today().isoformat()
+        }))
+        referrer = self._credit(referrer, p_reward, 1)
+        return [{"status": "ok", "referrer_id": referrer["user_id"], "referrals": referrer["referrals"],
+                 "balance": referrer["balance"]}]
+
+    def _rpc_users_balance_total(self):
+        users = self._run(self.table("users").select("balance")).data
+        return [{
+            "total_users": len(users),
+            "total_balance": sum(float(u.get("balance") or 0) for u in users)
+        }]
+
+    def _rpc_apply_balance_deltas(self, p_batch_id, p_deltas):
+        if self._one("balance_batches", batch_id=p_batch_id) is not None:
+            return []
+        self._run(self.table("balance_batches").insert({"batch_id": p_batch_id}))
+        result = []
+        for user_id, amount in p_deltas.items():
+            user = self._one("users", user_id=int(user_id))
+            if user is not None:
+                user = self._credit(user, amount)
+                result.append({"user_id": user["user_id"], "balance": user["balance"]})
+        return result
+
+
+_OPS = {
+    "eq": lambda v, x: v == x,
+    "neq": lambda v, x: v is not None and v != x,
+    "gt": lambda v, x: v is not None and v > x,
+    "gte": lambda v, x: v is not None and v >= x,
+    "lt": lambda v, x: v is not None and v < x,
+    "lte": lambda v, x: v is not None and v <= x,
+    "in": lambda v, x: v in x,
+}
+
+
+class MemoryClient(LocalClient):
+    """Rows in Python lists, gone with the process (DB_BACKEND=memory)
+
+    Rows are also indexed by primary key and unique columns, so the eq()
+    lookups that make up most of the bot's traffic stay O(1) however many
+    users are loaded.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.tables = defaultdict(list)
+        # table -> columns of the primary key / a unique constraint -> values -> row
+        self._indexes = defaultdict(lambda: defaultdict(dict))
+        self._ids = defaultdict(lambda: itertools.count(1))
+        self._insert_row("bot_stats", {"id": 1, "total_users": 0})
+
+    @staticmethod
+    def _unique(table):
+        return (TABLES[table].key,) + TABLES[table].unique
+
+    def _index(self, table, row):
+        for columns in self._unique(table):
+            values = tuple(row.get(column) for column in columns)
+            if None not in values:
+                self._indexes[table][columns][values] = row
+
+    def _unindex(self, table, row):
+        for columns in self._unique(table):
+            self._indexes[table][columns].pop(tuple(row.get(column) for column in columns), None)
+
+    def _check_unique(self, table, row):
+        for columns in self._unique(table):
+            existing = self._indexes[table][columns].get(tuple(row.get(column) for column in columns))
+            if existing is not None and existing is not row:
+                name = f"{table}_pkey" if columns == TABLES[table].key else f"{table}_{'_'.join(columns)}_key"
+                raise LocalAPIError(f'duplicate key value violates unique constraint "{name}"', "23505")
+
+    def _match(self, query):
+        indexes = self._indexes[query.table]
+        rows = self.tables[query.table]
+        for column, op, value in query.filters:
+            if op == "eq" and (column,) in indexes:
+                row = indexes[(column,)].get((value,))
+                rows = [row] if row is not None else []
+                break
+        return [
+            row for row in rows
+            if all(_OPS[op](row.get(column), x) for column, op, x in query.filters)
+        ]
+
+    def _project(self, rows, columns):
+        if columns == "*":
+            return [dict(row) for row in rows]
+        keys = [c.strip() for c in columns.split(",")]
+        return [{k: row.get(k) for k in keys} for row in rows]
+
+    def _insert_row(self, table, row):
+        row = self._with_defaults(table, row)
+        if TABLES[table].serial and row.get("id") is None:
+            row["id"] = next(self._ids[table])
+        self._check_unique(table, row)
+        self._index(table, row)
+        self.tables[table].append(row)
+        if table == "users":
+            # bot_stats trigger
+            self._indexes["bot_stats"][("id",)][(1,)]["total_users"] += 1
+        return row
+
+    def _run(self, query):
+        if query.op == "select":
+            rows = self._match(query)
+            count = len(rows) if query.count else None
+            if query.order_by:
+                rows = sorted(rows, key=lambda r: (r.get(query.order_by) is None, r.get(query.order_by)),
+                              reverse=query.order_desc)
+            if query.limit_n is not None:
+                rows = rows[query.offset:query.offset + query.limit_n]
+            return LocalResponse(self._project(rows, query.columns), count)
+
+        if query.op == "insert":
+            return LocalResponse([dict(self._insert_row(query.table, row)) for row in query.rows])
+
+        if query.op == "upsert":
+            keys = query.conflict_keys
+            index = self._indexes[query.table].get(keys)
+            result = []
+            for row in query.rows:
+                if index is not None:
+                    existing = index.get(tuple(row.get(k) for k in keys))
+                else:
+                    existing = next((r for r in self.tables[query.table]
+                                     if all(r.get(k) == row.get(k) for k in keys)), None)
+                if existing is not None:
+                    self._update_row(query.table, existing, row)
+                    result.append(dict(existing))
+                else:
+                    result.append(dict(self._insert_row(query.table, row)))
+            return LocalResponse(result)
+
+        if query.op == "update":
+            rows = self._match(query)
+            for row in rows:
+                self._update_row(query.table, row, query.payload)
+            return LocalResponse([dict(row) for row in rows])
+
+        if query.op == "delete":
+            rows = self._match(query)
+            doomed = {id(row) for row in rows}
+            self.tables[query.table] = [r for r in self.tables[query.table] if id(r) not in doomed]
+            for row in rows:
+                self._unindex(query.table, row)
+            return LocalResponse([dict(row) for row in rows])
+
+        raise ValueError(f"Unsupported operation: {query.op}")
+
+    def _update_row(self, table, row, values):
+        if any(column in values for columns in self._unique(table) for column in columns):
+            self._check_unique(table, {**row, **values})
+            self._unindex(table, row)
+            row.update(values)
+            self._index(table, row)
+        else:
+            row.update(values)
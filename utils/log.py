@@ -0,0 +1,156 @@
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json | text
+LOG_STREAM = os.getenv("LOG_STREAM", "stdout")  # stdout | stderr
+
+# Share of INFO/DEBUG events written for the high-volume ones (warnings and errors are always kept)
+DEFAULT_SAMPLING = {
+    "ad_reward": 0.1,
+    "balance_shown": 0.1,
+    "balance_changed": 0.1,
+    "commission": 0.1,
+    "bonus_claimed": 0.5,
+    "bonus_already_claimed": 0.1,
+    "referral_info_shown": 0.1,
+    "user_exists": 0.05,
+}
+
+_RESERVED = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+_listener = None
+
+
+def _parse_sampling(spec: str) -> dict:
+    """LOG_SAMPLE="ad_reward=0.01,balance_shown=0" -> {event: rate}"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        event, _, rate = item.partition("=")
+        rates[event.strip()] = float(rate)
+    return rates
+
+
+SAMPLING = {**DEFAULT_SAMPLING, **_parse_sampling(os.getenv("LOG_SAMPLE", ""))}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, event, msg + the event's fields"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": getattr(record, "event", None) or "log",
+        }
+        message = record.getMessage()
+        if message:
+            entry["msg"] = message
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and key != "event":
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable variant: time level event msg key=value ..."""
+
+    def format(self, record):
+        fields = " ".join(
+            f"{key}={value}" for key, value in record.__dict__.items()
+            if key not in _RESERVED and key != "event"
+        )
+        line = f"{self.formatTime(record, '%H:%M:%S')} {record.levelname:<7} {getattr(record, 'event', record.name)}"
+        message = record.getMessage()
+        if message:
+            line += f" {message}"
+        if fields:
+            line += f" {fields}"
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class _QueueHandler(QueueHandler):
+    """Enqueue the record as is - QueueHandler.prepare() would format it on the loop"""
+
+    def prepare(self, record):
+        return record
+
+
+def setup_logging() -> None:
+    """Route all logging through a queue to a background writer thread
+
+    Handlers on the event loop only enqueue records; formatting and the
+    blocking stdout write happen on the listener thread.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stderr if LOG_STREAM == "stderr" else sys.stdout)
+    stream.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers[:] = [_QueueHandler(log_queue)]
+    root.setLevel(LOG_LEVEL)
+    # One line per Bot API / PostgREST request otherwise
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    _listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+class EventLogger:
+    """Structured events: log.info("ad_reward", user_id=1, reward=2.5)
+
+    Events listed in SAMPLING are only written for that share of calls,
+    decided before anything is formatted.
+    """
+
+    def __init__(self, name: str):
+        self.logger = logging.getLogger(name)
+
+    def _log(self, level: int, event: str, msg: str, fields: dict):
+        if level < logging.WARNING:
+            rate = SAMPLING.get(event)
+            if rate is not None and (rate <= 0 or random.random() >= rate):
+                return
+            if rate is not None and rate < 1:
+                fields["sampled"] = rate
+        if not self.logger.isEnabledFor(level):
+            return
+        fields["event"] = event
+        self.logger.log(level, msg, extra=fields, exc_info=fields.pop("exc_info", None))
+
+    def debug(self, event: str, msg: str = "", **fields):
+        self._log(logging.DEBUG, event, msg, fields)
+
+    def info(self, event: str, msg: str = "", **fields):
+        self._log(logging.INFO, event, msg, fields)
+
+    def warning(self, event: str, msg: str = "", **fields):
+        self._log(logging.WARNING, event, msg, fields)
+
+    def error(self, event: str, msg: str = "", **fields):
+        self._log(logging.ERROR, event, msg, fields)
+
+
+def get_logger(name: str) -> EventLogger:
+    return EventLogger(name)
+
+
+def elapsed_ms(started: float) -> float:
+    """Milliseconds since a time.perf_counter() reading"""
+    return round((time.perf_counter() - started) * 1000, 2)
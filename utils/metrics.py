@@ -0,0 +1,223 @@
+import os
+import time
+import asyncio
+import inspect
+import contextvars
+from bisect import bisect_left
+from functools import wraps
+from collections import defaultdict
+from utils.log import get_logger
+from utils.webhook import MalformedRequest, read_request, write_response
+
+log = get_logger(__name__)
+
+# Prometheus text endpoint (0 = off); shard workers serve on METRICS_PORT + shard
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_LISTEN = os.getenv("METRICS_LISTEN", "127.0.0.1")
+
+# Seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Database round trips per update
+CALL_BUCKETS = (0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20)
+
+# Round trips of the update being handled (set by the handler wrapper)
+_db_calls = contextvars.ContextVar("db_calls", default=None)
+
+
+class Histogram:
+    """Fixed-bucket histogram (cumulative counts rendered Prometheus-style)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Estimate from the buckets (linear inside the bucket)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, count in enumerate(self.counts):
+            upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+            if count and seen + count >= rank:
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            lower = upper
+        return self.buckets[-1]
+
+
+class Metrics:
+    """Process-wide latency / error / round-trip bookkeeping"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.handler_latency = defaultdict(Histogram)
+        self.handler_errors = defaultdict(int)
+        self.handler_db_calls = defaultdict(lambda: Histogram(CALL_BUCKETS))
+        self.db_latency = defaultdict(Histogram)
+        self.db_errors = defaultdict(int)
+        self.round_trips = Histogram()
+        self.gauges = {}  # name -> callable returning {label_or_None: value}
+
+    # ============================================
+    # RECORDING
+    # ============================================
+
+    def db_round_trip(self, seconds: float) -> None:
+        """One PostgREST request (SupabaseDB._execute)"""
+        self.round_trips.observe(seconds)
+        calls = _db_calls.get()
+        if calls is not None:
+            calls[0] += 1
+
+    def handler(self, name: str, callback):
+        """Wrap a PTB callback: latency, errors and DB round trips per update"""
+        @wraps(callback)
+        async def wrapper(update, context):
+            token = _db_calls.set([0])
+            started = time.perf_counter()
+            try:
+                return await callback(update, context)
+            except Exception:
+                self.handler_errors[name] += 1
+                raise
+            finally:
+                self.handler_latency[name].observe(time.perf_counter() - started)
+                self.handler_db_calls[name].observe(_db_calls.get()[0])
+                _db_calls.reset(token)
+        return wrapper
+
+    def method(self, name: str, func):
+        """Wrap a coroutine method: latency and errors"""
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                self.db_errors[name] += 1
+                raise
+            finally:
+                self.db_latency[name].observe(time.perf_counter() - started)
+        return wrapper
+
+    def gauge(self, name: str, read) -> None:
+        """Register read() -> {label or None: value}, sampled at render time"""
+        self.gauges[name] = read
+
+    # ============================================
+    # OUTPUT
+    # ============================================
+
+    def summary(self) -> list:
+        """Per handler: (name, calls, p50 s, p95 s, errors, avg DB calls), slowest p95 first"""
+        rows = [
+            (name, h.count, h.quantile(0.5), h.quantile(0.95), self.handler_errors[name],
+             self.handler_db_calls[name].mean)
+            for name, h in self.handler_latency.items()
+        ]
+        return sorted(rows, key=lambda row: row[3], reverse=True)
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+        self._histograms(lines, "bot_handler_latency_seconds", "handler", self.handler_latency)
+        self._counters(lines, "bot_handler_errors_total", "handler", self.handler_errors)
+        self._histograms(lines, "bot_handler_db_calls", "handler", self.handler_db_calls)
+        self._histograms(lines, "bot_db_method_latency_seconds", "method", self.db_latency)
+        self._counters(lines, "bot_db_method_errors_total", "method", self.db_errors)
+        self._histograms(lines, "bot_db_round_trip_seconds", None, {None: self.round_trips})
+        for name, read in self.gauges.items():
+            lines.append(f"# TYPE {name} gauge")
+            for label, value in read().items():
+                value = float(value)
+                lines.append(f'{name}{{key="{label}"}} {value}' if label else f"{name} {value}")
+        lines.append("# TYPE bot_uptime_seconds gauge")
+        lines.append(f"bot_uptime_seconds {time.time() - self.started:.0f}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _labels(label_name, label, extra=""):
+        parts = [f'{label_name}="{label}"'] if label_name else []
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def _histograms(self, lines, name, label_name, histograms):
+        lines.append(f"# TYPE {name} histogram")
+        for label, h in sorted(histograms.items(), key=lambda item: str(item[0])):
+            cumulative = 0
+            for bound, count in zip(h.buckets + ("+Inf",), h.counts):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{name}_bucket{self._labels(label_name, label, le)} {cumulative}")
+            lines.append(f"{name}_sum{self._labels(label_name, label)} {h.sum:.6f}")
+            lines.append(f"{name}_count{self._labels(label_name, label)} {h.count}")
+
+    def _counters(self, lines, name, label_name, counters):
+        lines.append(f"# TYPE {name} counter")
+        for label, value in sorted(counters.items()):
+            lines.append(f"{name}{self._labels(label_name, label)} {value}")
+
+
+metrics = Metrics()
+
+
+def instrument_class(cls, skip=()):
+    """Time every public coroutine method of cls (async generators are left alone)"""
+    for name, func in list(vars(cls).items()):
+        if name.startswith("_") or name in skip or not inspect.iscoroutinefunction(func):
+            continue
+        setattr(cls, name, metrics.method(name, func))
+    return cls
+
+
+def instrument_handlers(app) -> None:
+    """Wrap the callback of every handler registered on a PTB Application"""
+    for handlers in app.handlers.values():
+        for handler in handlers:
+            handler.callback = metrics.handler(handler.callback.__name__, handler.callback)
+
+
+async def start_metrics_server(port: int = METRICS_PORT, listen: str = METRICS_LISTEN):
+    """Serve GET /metrics (Prometheus text format); returns the server or None when off"""
+    if not port:
+        return None
+
+    async def handle(reader, writer):
+        try:
+            try:
+                request = await read_request(reader)
+            except MalformedRequest:
+                write_response(writer, 400, keep_alive=False)
+                await writer.drain()
+                return
+            if request is None:
+                return
+            method, path, _, _ = request
+            if method == "GET" and path.split("?", 1)[0] == "/metrics":
+                write_response(writer, 200, metrics.render().encode(), "text/plain; version=0.0.4",
+                               keep_alive=False)
+            else:
+                write_response(writer, 404, keep_alive=False)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, TimeoutError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, listen, port)
+    log.info("metrics_listening", listen=listen, port=port)
+    return server
@@ -0,0 +1,49 @@
+import os
+import re
+import hmac
+import base64
+import hashlib
+from functools import lru_cache
+
+# r<user_id base36>_<8 char HMAC> - e.g. r2n9c_Qk3v-J8a (fits a t.me ?start= parameter)
+_CODE = re.compile(r"r([0-9a-z]{1,13})_([A-Za-z0-9_-]{8})")
+_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+@lru_cache(maxsize=1)
+def _key() -> bytes:
+    """REFERRAL_SECRET - its own secret, so rotating BOT_TOKEN keeps shared links valid"""
+    secret = os.getenv("REFERRAL_SECRET")
+    if not secret:
+        raise ValueError("REFERRAL_SECRET missing!")
+    return secret.encode()
+
+
+def _base36(n: int) -> str:
+    digits = ""
+    while True:
+        n, rest = divmod(n, 36)
+        digits = _DIGITS[rest] + digits
+        if not n:
+            return digits
+
+
+def _sign(body: str) -> str:
+    return base64.urlsafe_b64encode(hmac.digest(_key(), body.encode(), hashlib.sha256)[:6]).decode()
+
+
+def make_referral_code(user_id: int) -> str:
+    """Signed code carrying user_id - decoded without a database lookup"""
+    body = _base36(user_id)
+    return f"r{body}_{_sign(body)}"
+
+
+def decode_referral_code(code: str):
+    """user_id of a valid signed code; None for legacy (REF_...) or forged codes"""
+    match = _CODE.fullmatch(code)
+    if match is None:
+        return None
+    body, signature = match.groups()
+    if not hmac.compare_digest(signature, _sign(body)):
+        return None
+    return int(body, 36)
@@ -0,0 +1,107 @@
+from array import array
+from bisect import bisect_left
+
+# Stored for users known to have no referrer (negative entry)
+NO_REFERRER = 0
+
+
+class ReferrerIndex:
+    """Compact user_id -> referrer_id map (a referrer never changes once set)
+
+    Bulk data lives in two sorted array('q') columns - 16 bytes per user, so
+    millions of users fit in a few dozen MB. Recent writes go to a small dict
+    overlay that is merged into the arrays once it grows past `merge_at`.
+
+    get() returns the referrer id, NO_REFERRER for a cached negative, or None
+    when the index does not know. After a full load() the index is complete
+    and every miss is a negative.
+
+    Deleted referrers are kept in a tombstone set that get() checks, so a
+    delete costs O(1); the next merge clears them out of the arrays.
+    """
+
+    def __init__(self, merge_at: int = 50000):
+        self.merge_at = merge_at
+        self.complete = False
+        self._keys = array("q")
+        self._values = array("q")
+        self._overlay = {}
+        self._removed = set()  # deleted referrers still present as values
+
+    def __len__(self):
+        return len(self._keys) + len(self._overlay)
+
+    def get(self, user_id: int):
+        value = self._overlay.get(user_id)
+        if value is None:
+            i = bisect_left(self._keys, user_id)
+            if i < len(self._keys) and self._keys[i] == user_id:
+                value = self._values[i]
+            else:
+                return NO_REFERRER if self.complete else None
+        return NO_REFERRER if value in self._removed else value
+
+    def set(self, user_id: int, referrer_id: int = NO_REFERRER) -> None:
+        if referrer_id in self._removed:
+            # A deleted user came back and refers again - drop the old links first
+            self._merge()
+        self._overlay[user_id] = referrer_id or NO_REFERRER
+        if len(self._overlay) >= self.merge_at:
+            self._merge()
+
+    def remove_user(self, user_id: int) -> None:
+        """Forget a deleted user - as a new user and as a referrer"""
+        self.remove_users((user_id,))
+
+    def remove_users(self, user_ids) -> None:
+        """remove_user for many ids - tombstoned, never a pass over the index"""
+        for user_id in user_ids:
+            self._overlay[user_id] = NO_REFERRER
+            self._removed.add(user_id)
+        if len(self._overlay) >= self.merge_at:
+            self._merge()
+
+    def load(self, pairs) -> None:
+        """Replace the index with (user_id, referrer_id) pairs - marks it complete"""
+        self._overlay = dict(pairs)
+        self._keys = array("q")
+        self._values = array("q")
+        self._removed = set()
+        self._merge()
+        self.complete = True
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._keys),
+            "overlay": len(self._overlay),
+            "removed": len(self._removed),
+            "complete": self.complete,
+            "bytes": self._keys.itemsize * (len(self._keys) + len(self._values))
+        }
+
+    def _merge(self):
+        """Fold the overlay into the sorted arrays (slice copies between updates)"""
+        if self._removed:
+            removed = self._removed
+            for i, referrer_id in enumerate(self._values):
+                if referrer_id in removed:
+                    self._values[i] = NO_REFERRER
+            for key, referrer_id in self._overlay.items():
+                if referrer_id in removed:
+                    self._overlay[key] = NO_REFERRER
+            self._removed = set()
+        keys, values = array("q"), array("q")
+        i = 0
+        for key, value in sorted(self._overlay.items()):
+            j = bisect_left(self._keys, key, i)
+            keys.extend(self._keys[i:j])
+            values.extend(self._values[i:j])
+            if j < len(self._keys) and self._keys[j] == key:
+                j += 1
+            keys.append(key)
+            values.append(value)
+            i = j
+        keys.extend(self._keys[i:])
+        values.extend(self._values[i:])
+        self._keys, self._values = keys, values
+        self._overlay = {}
@@ -0,0 +1,108 @@
+import os
+import queue
+import asyncio
+import multiprocessing
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+SHARDS = int(os.getenv("SHARDS", "1"))
+# Shard that owns the admin commands (and broadcast jobs)
+ADMIN_SHARD = int(os.getenv("ADMIN_SHARD", "0"))
+ADMIN_COMMANDS = ("/broadcast", "/cleanup", "/perf")
+
+# Update fields that carry the acting user under "from" (PTB's effective_user)
+USER_FIELDS = ("message", "edited_message", "callback_query", "inline_query",
+               "chosen_inline_result", "shipping_query", "pre_checkout_query",
+               "my_chat_member", "chat_member", "chat_join_request", "poll_answer")
+
+
+def update_user_id(data: dict):
+    """effective_user.id straight from the raw update dict, None if there is none"""
+    for field in USER_FIELDS:
+        item = data.get(field)
+        if item:
+            user = item.get("from") or item.get("user")
+            return user["id"] if user else None
+    return None
+
+
+def is_admin_command(data: dict) -> bool:
+    text = (data.get("message") or {}).get("text") or ""
+    return text.split(" ", 1)[0].split("@", 1)[0] in ADMIN_COMMANDS
+
+
+def shard_for(data: dict, shards: int) -> int:
+    """All updates of one user go to the same shard, admin commands to ADMIN_SHARD"""
+    if is_admin_command(data):
+        return ADMIN_SHARD
+    user_id = update_user_id(data)
+    return user_id % shards if user_id is not None else ADMIN_SHARD
+
+
+class ShardPool:
+    """Worker processes that each run the full bot on their own event loop
+
+    The front process only receives updates and forwards the raw dict to
+    the shard picked by shard_for(). A user always lands on the same worker,
+    which handles its updates in order (main.build_application runs them
+    through utils.user_locks.PerUserUpdateProcessor), so per-user ordering holds
+    while different users are spread over all cores and handled concurrently.
+
+    `target(shard_id, shards, inbox)` runs in the child; it reads update
+    dicts from `inbox` until it gets None (see ShardPool.feed).
+    """
+
+    def __init__(self, target, shards: int = SHARDS):
+        self.target = target
+        self.shards = shards
+        self.forwarded = [0] * shards
+        ctx = multiprocessing.get_context("spawn")
+        self.inboxes = [ctx.Queue() for _ in range(shards)]
+        self.processes = [
+            ctx.Process(target=target, args=(i, shards, self.inboxes[i]), name=f"shard-{i}", daemon=True)
+            for i in range(shards)
+        ]
+
+    def start(self) -> None:
+        for process in self.processes:
+            process.start()
+        log.info("shards_started", shards=self.shards)
+
+    def dispatch(self, data: dict) -> int:
+        shard = shard_for(data, self.shards)
+        self.inboxes[shard].put_nowait(data)
+        self.forwarded[shard] += 1
+        return shard
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """Let every worker drain its inbox and shut down cleanly"""
+        for inbox in self.inboxes:
+            inbox.put(None)
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                # Workers ignore SIGTERM (run_shard) - a hung one only goes away with SIGKILL
+                log.warning("shard_killed", shard=process.name, timeout=timeout)
+                process.kill()
+                process.join(5.0)
+        log.info("shards_stopped", forwarded=self.forwarded)
+
+    @staticmethod
+    async def feed(inbox, on_update) -> None:
+        """Worker side: hand inbox updates to on_update(data) until None
+
+        Stops on its own if the front process dies.
+        """
+        loop = asyncio.get_running_loop()
+        parent = multiprocessing.parent_process()
+        while True:
+            try:
+                data = await loop.run_in_executor(None, inbox.get, True, 1.0)
+            except queue.Empty:
+                if parent is not None and not parent.is_alive():
+                    return
+                continue
+            if data is None:
+                return
+            await on_update(data)
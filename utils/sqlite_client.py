@@ -0,0 +1,168 @@
+import sqlite3
+import asyncio
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from utils.local_client import TABLES, LocalAPIError, LocalClient, LocalResponse
+
+_SQL_OPS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+
+def _quote(name):
+    return f'"{name}"'
+
+
+def schema_sql() -> str:
+    """CREATE statements for TABLES plus the bot_stats trigger"""
+    statements = []
+    for name, spec in TABLES.items():
+        columns = []
+        for column, kind in spec.columns.items():
+            if spec.serial and column == "id":
+                columns.append('"id" INTEGER PRIMARY KEY AUTOINCREMENT')
+            else:
+                columns.append(f"{_quote(column)} {kind}")
+        if not spec.serial:
+            columns.append(f"PRIMARY KEY ({', '.join(map(_quote, spec.key))})")
+        statements.append(f"CREATE TABLE IF NOT EXISTS {_quote(name)} ({', '.join(columns)})")
+        for index in spec.indexes:
+            statements.append(
+                f"CREATE INDEX IF NOT EXISTS {_quote(name + '_' + '_'.join(index) + '_idx')} "
+                f"ON {_quote(name)} ({', '.join(map(_quote, index))})"
+            )
+        for index in spec.unique:
+            statements.append(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {_quote(name + '_' + '_'.join(index) + '_key')} "
+                f"ON {_quote(name)} ({', '.join(map(_quote, index))})"
+            )
+    statements.append(
+        "CREATE TRIGGER IF NOT EXISTS users_count_insert AFTER INSERT ON users BEGIN "
+        "UPDATE bot_stats SET total_users = total_users + 1 WHERE id = 1; END"
+    )
+    statements.append("INSERT OR IGNORE INTO bot_stats (id, total_users) VALUES (1, 0)")
+    return ";\n".join(statements) + ";"
+
+
+class SQLiteClient(LocalClient):
+    """Rows in an SQLite file that survives restarts (DB_BACKEND=sqlite)
+
+    Queries are translated to SQL, so filters, ordering and keyset scans
+    use real indexes. Statements run on one worker thread: several shard
+    processes may share the file (WAL, busy timeout), and a shard waiting
+    for another one's write lock must not stall its event loop.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        super().__init__()
+        self.path = path
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA busy_timeout = 5000")
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode = WAL")
+            self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.executescript(schema_sql())
+        # One thread - the connection is never used by two statements at once
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+
+    def close(self) -> None:
+        self._io.shutdown()
+        self.conn.close()
+
+    async def _execute(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._io, fn, *args)
+
+    @contextmanager
+    def _transaction(self):
+        if self.conn.in_transaction:  # already inside an RPC
+            yield
+            return
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    # ============================================
+    # QUERY EXECUTION
+    # ============================================
+
+    def _column(self, table, column):
+        column = column.strip()
+        if column not in TABLES[table].columns:
+            raise LocalAPIError(f"column {table}.{column} does not exist", "42703")
+        return _quote(column)
+
+    def _where(self, query):
+        clauses, params = [], []
+        for column, op, value in query.filters:
+            column = self._column(query.table, column)
+            if op == "in":
+                if not value:
+                    clauses.append("0")
+                    continue
+                clauses.append(f"{column} IN ({', '.join('?' * len(value))})")
+                params.extend(value)
+            else:
+                clauses.append(f"{column} {_SQL_OPS[op]} ?")
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def _rows(self, sql, params=()):
+        try:
+            return [dict(row) for row in self.conn.execute(sql, params).fetchall()]
+        except sqlite3.IntegrityError as e:
+            raise LocalAPIError(str(e), "23505") from e
+
+    def _run(self, query):
+        table = _quote(query.table)
+        where, params = self._where(query)
+
+        if query.op == "select":
+            if query.columns == "*":
+                columns = "*"
+            else:
+                columns = ", ".join(self._column(query.table, c) for c in query.columns.split(","))
+            sql = f"SELECT {columns} FROM {table}{where}"
+            if query.order_by:
+                column = self._column(query.table, query.order_by)
+                direction = "DESC" if query.order_desc else "ASC"
+                # Postgres puts NULLs last ascending, first descending
+                sql += f" ORDER BY ({column} IS NULL) {direction}, {column} {direction}"
+            if query.limit_n is not None:
+                sql += f" LIMIT {int(query.limit_n)} OFFSET {int(query.offset)}"
+            count = None
+            if query.count:
+                count = self.conn.execute(f"SELECT COUNT(*) FROM {table}{where}", params).fetchone()[0]
+            return LocalResponse(self._rows(sql, params), count)
+
+        if query.op in ("insert", "upsert"):
+            result = []
+            keys = query.conflict_keys
+            # Several rows go in all-or-nothing, as in one PostgREST request
+            with self._transaction():
+                for sent in query.rows:
+                    row = self._with_defaults(query.table, sent)
+                    if TABLES[query.table].serial and row.get("id") is None:
+                        del row["id"]
+                    columns = ", ".join(self._column(query.table, c) for c in row)
+                    sql = f"INSERT INTO {table} ({columns}) VALUES ({', '.join('?' * len(row))})"
+                    if query.op == "upsert":
+                        # Only the columns the caller sent are overwritten
+                        updates = ", ".join(f"{_quote(c)} = excluded.{_quote(c)}" for c in sent if c not in keys)
+                        target = ", ".join(self._column(query.table, k) for k in keys)
+                        sql += f" ON CONFLICT ({target}) DO " + (f"UPDATE SET {updates}" if updates else "NOTHING")
+                    result.extend(self._rows(sql + " RETURNING *", list(row.values())))
+            return LocalResponse(result)
+
+        if query.op == "update":
+            assignments = ", ".join(f"{self._column(query.table, c)} = ?" for c in query.payload)
+            sql = f"UPDATE {table} SET {assignments}{where} RETURNING *"
+            return LocalResponse(self._rows(sql, list(query.payload.values()) + params))
+
+        if query.op == "delete":
+            return LocalResponse(self._rows(f"DELETE FROM {table}{where} RETURNING *", params))
+
+        raise ValueError(f"Unsupported operation: {query.op}")
+
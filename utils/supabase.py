@@ -1,59 +1,167 @@
 import os
 import asyncio
-import random
+import time
+from array import array
 from datetime import date, timedelta, datetime
-from supabase import create_client, Client
+from typing import Optional
 from dotenv import load_dotenv
+from utils.balance_buffer import BalanceAccumulator
+from utils.cache import TTLCache
+from utils.referrer_index import ReferrerIndex, NO_REFERRER
+from utils.referral_codes import make_referral_code, decode_referral_code
+from utils.local_client import LocalClient, MemoryClient
+from utils.sqlite_client import SQLiteClient
+from utils.http_pool import create_postgrest_client, pool_stats, warmup_connections
+from utils.log import get_logger, elapsed_ms
+from utils.metrics import metrics, instrument_class
 
 load_dotenv()
 
+log = get_logger(__name__)
+
+# Referrer's share of every ad reward
+COMMISSION_RATE = 0.05
+
+# Rs, once per calendar day
+DAILY_BONUS = 5.0
+
+# Rs to the referrer for every new user
+REFERRAL_REWARD = 40.0
+
+# supabase | memory | sqlite - the last two run the bot fully offline
+# (memory is per process: not for BOT_SHARDS > 1)
+DB_BACKEND = os.getenv("DB_BACKEND", "supabase").lower()
+DB_SQLITE_PATH = os.getenv("DB_SQLITE_PATH", "bot.sqlite3")
+
+# Rows per page for full-table scans (scan_table)
+SCAN_PAGE_SIZE = int(os.getenv("SCAN_PAGE_SIZE", "1000"))
+
 class SupabaseDB:
-    def __init__(self):
-        self.client = create_client(
-            os.getenv("SUPABASE_URL"),
-            os.getenv("SUPABASE_KEY")
+    def __init__(self, client=None):
+        # The client is created on the running event loop in connect()
+        # (DB_BACKEND); a utils.local_client.LocalClient can also be injected.
+        self.client = client
+        # Write-behind buffer for ad credits (BALANCE_WRITE_BEHIND=1)
+        self.balance_buffer = None
+        # Read-through cache of users rows - invalidated by every write below
+        self.user_cache = TTLCache(
+            maxsize=int(os.getenv("USER_CACHE_SIZE", "10000")),
+            ttl=float(os.getenv("USER_CACHE_TTL", "30"))
+        )
+        # user_id -> referrer_id (warmed lazily, or fully with REFERRER_INDEX_PRELOAD=1)
+        self.referrers = ReferrerIndex()
+        # Legacy REF_... code -> owner's user_id (NO_REFERRER: unknown code).
+        # Signed codes (utils/referral_codes.py) need no lookup at all.
+        self.legacy_codes = TTLCache(
+            maxsize=int(os.getenv("LEGACY_CODE_CACHE_SIZE", "10000")),
+            ttl=float(os.getenv("LEGACY_CODE_CACHE_TTL", "3600"))
         )
+        # Requests between _execute() start and finish
+        self.in_flight = 0
+        self.in_flight_max = 0
+
+    async def connect(self):
+        """Create the client for DB_BACKEND (idempotent)"""
+        if self.client is None:
+            if DB_BACKEND == "memory":
+                self.client = MemoryClient()
+            elif DB_BACKEND == "sqlite":
+                self.client = SQLiteClient(DB_SQLITE_PATH)
+            elif DB_BACKEND == "supabase":
+                # PostgREST only, on our own connection pool (utils/http_pool.py)
+                self.client = create_postgrest_client(
+                    os.getenv("SUPABASE_URL"),
+                    os.getenv("SUPABASE_KEY")
+                )
+            else:
+                raise ValueError(f"Unknown DB_BACKEND: {DB_BACKEND}")
+            log.info("db_connected", backend=DB_BACKEND)
+        return self.client
+
+    async def _execute(self, query):
+        """Run a PostgREST query without blocking the event loop (one round trip)"""
+        started = time.perf_counter()
+        self.in_flight += 1
+        self.in_flight_max = max(self.in_flight_max, self.in_flight)
+        try:
+            return await query.execute()
+        finally:
+            self.in_flight -= 1
+            metrics.db_round_trip(time.perf_counter() - started)
+
+    def pool_stats(self) -> dict:
+        """HTTP pool occupancy (empty for the local backends) + requests in flight"""
+        session = getattr(self.client, "session", None)
+        stats = pool_stats(session) if session is not None else {}
+        stats["in_flight"] = self.in_flight
+        stats["in_flight_max"] = self.in_flight_max
+        return stats
 
     async def init_table(self):
         try:
-            self.client.table("users").select("*").limit(0).execute()
-            print("✅ Users table ready")
-        except:
-            print("⚠️ Table ready")
+            await self.connect()
+            # Probe on several connections at once so the first users don't pay the TLS handshakes
+            probes = 1 if isinstance(self.client, LocalClient) else warmup_connections()
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                self._execute(self.client.table("users").select("*").limit(0)) for _ in range(probes)
+            ))
+            log.info("users_table_ready", connections=probes, latency_ms=elapsed_ms(started))
+        except Exception as e:
+            log.warning("users_table_probe_failed", error=str(e))
+
+        if os.getenv("BALANCE_WRITE_BEHIND", "0") == "1" and self.balance_buffer is None:
+            self.balance_buffer = BalanceAccumulator(
+                self._flush_balance_deltas,
+                os.getenv("BALANCE_JOURNAL_PATH", "balance_journal.log"),
+                flush_ms=int(os.getenv("BALANCE_FLUSH_MS", "500")),
+                max_entries=int(os.getenv("BALANCE_FLUSH_MAX", "500"))
+            )
+            await self.balance_buffer.start()
+            log.info("balance_write_behind_enabled")
+
+        if os.getenv("REFERRER_INDEX_PRELOAD", "0") == "1":
+            await self.load_referrer_index()
+
+    async def close(self):
+        """Flush buffered credits before shutdown"""
+        if self.balance_buffer:
+            await self.balance_buffer.stop()
+        if isinstance(self.client, LocalClient):
+            self.client.close()
+        elif self.client is not None:
+            await self.client.aclose()
 
     # ============================================
     # USER MANAGEMENT
     # ============================================
 
     async def get_user(self, user_id: int):
-        """Get user by user_id"""
-        try:
-            response = self.client.table("users").select("*").eq("user_id", user_id).execute()
-            return response.data[0] if response.data else None
-        except:
-            return None
+        """Get user by user_id (cached)"""
+        user = self.user_cache.get(user_id)
+        if user is not None:
+            return user
 
-    async def get_referrer_by_code(self, referral_code: str):
-        """Get referrer user by referral code"""
+        token = self.user_cache.token()
         try:
-            response = self.client.table("users").select("*").eq("referral_code", referral_code).execute()
-            return response.data[0] if response.data else None
+            response = await self._execute(self.client.table("users").select("*").eq("user_id", user_id))
         except:
             return None
+        if not response.data:
+            return None
+        user = response.data[0]
+        self.user_cache.put(user_id, user, token)
+        return user
 
-    async def user_already_referred(self, user_id: int) -> bool:
-        """Check if user already has a referrer"""
-        try:
-            response = self.client.table("referral_history").select("id").eq("new_user_id", user_id).execute()
-            return len(response.data) > 0
-        except:
-            return False
+    def cache_stats(self) -> dict:
+        """Hit/miss counters of the user cache"""
+        return self.user_cache.stats()
 
     async def create_user_if_not_exists(self, user_id: int, username: str = ""):
         """Create new user if not exists"""
         user = await self.get_user(user_id)
         if user:
-            print(f"👤 User {user_id} already exists - SKIPPING")
+            log.info("user_exists", user_id=user_id)
             return
 
         user_data = {
@@ -65,14 +173,15 @@ class SupabaseDB:
         if username:
             user_data["username"] = username
 
-        referral_code = f"REF_{user_id}_{random.randint(1000, 9999)}"
+        referral_code = make_referral_code(user_id)
         user_data["referral_code"] = referral_code
 
         try:
-            self.client.table("users").insert(user_data).execute()
-            print(f"👤 CREATED new user {user_id} with code {referral_code}")
+            await self._execute(self.client.table("users").insert(user_data))
+            self.user_cache.invalidate(user_id)
+            log.info("user_created", user_id=user_id, referral_code=referral_code)
         except Exception as e:
-            print(f"⚠️ Create error: {e}")
+            log.warning("user_create_failed", user_id=user_id, error=str(e))
 
     # ============================================
     # BALANCE OPERATIONS
@@ -81,89 +190,214 @@ class SupabaseDB:
     async def get_balance(self, user_id: int) -> float:
         """Get user balance"""
         user = await self.get_user(user_id)
-        return float(user["balance"]) if user and "balance" in user else 0.0
+        balance = float(user["balance"]) if user and "balance" in user else 0.0
+        if self.balance_buffer:
+            balance += self.balance_buffer.pending_for(user_id)
+        return balance
 
-    async def add_balance(self, user_id: int, amount: float) -> None:
-        """Add amount to user balance"""
-        current = await self.get_balance(user_id)
-        new_balance = current + amount
+    async def increment_balance(self, user_id: int, amount: float, referrals: int = 0):
+        """Atomic server-side increment (sql/functions.sql) - returns the updated row"""
         try:
-            self.client.table("users").update({"balance": new_balance}).eq("user_id", user_id).execute()
-            print(f"💰 User {user_id}: +{amount} = {new_balance}")
+            response = await self._execute(self.client.rpc("increment_balance", {
+                "p_user_id": user_id,
+                "p_amount": amount,
+                "p_referrals": referrals
+            }))
+        finally:
+            self.user_cache.invalidate(user_id)
+        return response.data[0] if response.data else None
+
+    async def add_balance(self, user_id: int, amount: float) -> Optional[float]:
+        """Add amount to user balance - ONE atomic round trip, returns new balance"""
+        try:
+            row = await self.increment_balance(user_id, amount)
+            if row is None:
+                log.warning("balance_user_not_found", user_id=user_id)
+                return None
+            new_balance = float(row["balance"])
+            log.info("balance_changed", user_id=user_id, amount=amount, balance=new_balance)
+            return new_balance
         except Exception as e:
-            print(f"❌ Balance error: {e}")
+            log.error("balance_change_failed", user_id=user_id, amount=amount, error=str(e))
+            return None
+
+    async def add_balance_deferred(self, user_id: int, amount: float):
+        """Queue a credit in the write-behind buffer (falls back to add_balance)
+
+        Returns the new balance when written through, None when buffered.
+        """
+        if self.balance_buffer is None:
+            return await self.add_balance(user_id, amount)
+        await self.balance_buffer.add(user_id, amount)
+        return None
+
+    async def credit_ad_reward(self, user_id: int, reward: float) -> Optional[float]:
+        """Credit an ad reward + referrer commission, returns the new balance (None on failure)
+
+        ONE round trip through the credit_ad_reward function. With the
+        write-behind buffer enabled both credits are queued instead.
+        """
+        if self.balance_buffer:
+            await self.balance_buffer.add(user_id, reward)
+            await self.add_referral_commission(user_id, reward)
+            return await self.get_balance(user_id)
+
+        try:
+            response = await self._execute(self.client.rpc("credit_ad_reward", {
+                "p_user_id": user_id,
+                "p_reward": reward,
+                "p_commission_rate": COMMISSION_RATE
+            }))
+        except Exception as e:
+            log.error("ad_credit_failed", user_id=user_id, reward=reward, error=str(e))
+            return None
+        finally:
+            self.user_cache.invalidate(user_id)
+
+        if not response.data:
+            log.warning("ad_credit_user_not_found", user_id=user_id)
+            return None
+        row = response.data[0]
+        self.referrers.set(user_id, row.get("referrer_id") or NO_REFERRER)
+        if row.get("referrer_id"):
+            self.user_cache.invalidate(row["referrer_id"])
+            log.info("commission", user_id=user_id, reward=reward, referrer_id=row["referrer_id"],
+                     commission=float(row["commission"]))
+        return float(row["balance"])
+
+    async def _flush_balance_deltas(self, batch_id: str, deltas: dict):
+        """Apply a batch of coalesced credits - ONE round trip for the batch"""
+        try:
+            await self._execute(self.client.rpc("apply_balance_deltas", {
+                "p_batch_id": batch_id,
+                "p_deltas": {str(user_id): amount for user_id, amount in deltas.items()}
+            }))
+        finally:
+            for user_id in deltas:
+                self.user_cache.invalidate(user_id)
+        log.info("balance_batch_flushed", batch_id=batch_id, users=len(deltas))
 
     # ============================================
     # DAILY BONUS
     # ============================================
 
-    async def give_daily_bonus(self, user_id: int) -> bool:
-        """Give 5 Rs daily bonus (once per day)"""
-        try:
-            user = await self.get_user(user_id)
-            if not user:
-                return False
+    async def claim_daily_bonus(self, user_id: int) -> dict:
+        """Daily bonus, once per day - ONE conditional update (claim_daily_bonus)
 
-            today = date.today().isoformat()
-            last_bonus = user.get("daily_bonus_date", "")
-            if last_bonus and last_bonus[:10] == today:
-                return False
+        Returns {"claimed": bool, "balance": float}, or None for an unknown
+        user or a failed request. Safe against double taps: only one of two
+        concurrent claims can match.
+        """
+        try:
+            response = await self._execute(self.client.rpc("claim_daily_bonus", {
+                "p_user_id": user_id,
+                "p_amount": DAILY_BONUS,
+                "p_today": date.today().isoformat()
+            }))
+        except Exception as e:
+            log.error("bonus_claim_failed", user_id=user_id, error=str(e))
+            return None
+        finally:
+            self.user_cache.invalidate(user_id)
 
-            await self.add_balance(user_id, 5.0)
-            self.client.table("users").update({"daily_bonus_date": today}).eq("user_id", user_id).execute()
-            return True
-        except:
-            return False
+        if not response.data:
+            log.warning("bonus_user_not_found", user_id=user_id)
+            return None
+        row = response.data[0]
+        balance = float(row["balance"])
+        if self.balance_buffer:
+            balance += self.balance_buffer.pending_for(user_id)
+        return {"claimed": bool(row["claimed"]), "balance": balance}
 
     # ============================================
     # REFERRAL SYSTEM
     # ============================================
 
-    async def process_referral(self, user_id: int, referrer_code: str):
-        """Process referral - INSTANT 40 Rs reward"""
-        if await self.user_already_referred(user_id):
-            print(f"❌ EXPLOIT BLOCKED: User {user_id} already has a referrer!")
-            return False
+    async def apply_referral(self, user_id: int, referrer_code: str) -> dict:
+        """Credit the referrer of a new user - ONE transactional call (apply_referral)
+
+        Returns the function's row: status (ok | already_referred |
+        self_referral | unknown_code), referrer_id and, on ok, the
+        referrer's new referrals count and balance. None on a failed
+        request. The unique new_user_id constraint makes a second
+        referral of the same user impossible, however the calls race.
+
+        Signed codes are decoded locally and legacy codes resolved from
+        legacy_codes when possible, so the function only has to look the
+        code up on a cache miss.
+        """
+        if self.referrers.get(user_id):
+            # a referrer never changes once set - no round trip needed
+            return {"status": "already_referred", "referrer_id": self.referrers.get(user_id)}
+
+        referrer_id = decode_referral_code(referrer_code)
+        legacy = referrer_id is None
+        if legacy:
+            referrer_id = self.legacy_codes.get(referrer_code)
+        if referrer_id == NO_REFERRER:
+            log.warning("referral_rejected", user_id=user_id, code=referrer_code, status="unknown_code")
+            return {"status": "unknown_code", "referrer_id": None}
+        if referrer_id == user_id:
+            log.warning("referral_rejected", user_id=user_id, code=referrer_code, status="self_referral")
+            return {"status": "self_referral", "referrer_id": user_id}
+
+        params = {"p_new_user_id": user_id, "p_code": referrer_code, "p_reward": REFERRAL_REWARD}
+        if referrer_id is not None:
+            params["p_referrer_id"] = referrer_id
+        token = self.legacy_codes.token()
+        try:
+            response = await self._execute(self.client.rpc("apply_referral", params))
+        except Exception as e:
+            log.error("referral_failed", user_id=user_id, error=str(e))
+            return None
 
+        row = response.data[0] if response.data else {"status": "unknown_code", "referrer_id": None}
+        if legacy:
+            if row["status"] in ("ok", "self_referral"):
+                self.legacy_codes.put(referrer_code, row["referrer_id"], token)
+            elif row["status"] == "unknown_code":
+                # also drops a cached owner that has since been deleted
+                self.legacy_codes.put(referrer_code, NO_REFERRER, token)
+        if row.get("referrer_id") and row["status"] in ("ok", "already_referred"):
+            self.referrers.set(user_id, row["referrer_id"])
+        if row["status"] == "ok":
+            self.user_cache.invalidate(row["referrer_id"])
+            log.info("referral", user_id=user_id, referrer_id=row["referrer_id"], reward=REFERRAL_REWARD,
+                     referrals=row["referrals"], legacy_code=legacy)
+        else:
+            log.warning("referral_rejected", user_id=user_id, code=referrer_code, status=row["status"])
+        return row
+
+    async def get_referrer_id(self, user_id: int):
+        """Referrer of user_id (None if none) - served from the in-memory index"""
+        referrer_id = self.referrers.get(user_id)
+        if referrer_id is None:
+            response = await self._execute(self.client.table("referral_history").select("referrer_id").eq("new_user_id", user_id))
+            referrer_id = response.data[0]["referrer_id"] if response.data else NO_REFERRER
+            self.referrers.set(user_id, referrer_id)
+        return referrer_id or None
+
+    async def load_referrer_index(self):
+        """Bulk-load every referral into the index (makes negatives free)"""
         try:
-            referrer = await self.get_referrer_by_code(referrer_code)
-            if referrer and referrer["user_id"] != user_id:
-                referrer_id = referrer["user_id"]
-                
-                # Give instant 40 Rs bonus
-                await self.add_balance(referrer_id, 40.0)
-                current_refs = int(referrer.get("referrals", 0))
-                self.client.table("users").update({"referrals": current_refs + 1}).eq("user_id", referrer_id).execute()
-                
-                # Store referral history
-                try:
-                    self.client.table("referral_history").insert({
-                        "new_user_id": user_id,
-                        "referrer_id": referrer_id,
-                        "referral_code": referrer_code,
-                        "created_at": date.today().isoformat()
-                    }).execute()
-                    print(f"📊 Referral history stored: {user_id} → {referrer_id}")
-                except Exception as e:
-                    print(f"⚠️ History error: {e}")
-                
-                print(f"✅ REFERRAL: {user_id} → {referrer_id} (+40 Rs INSTANT)")
-                return True
+            pairs = []
+            async for page in self.scan_table("referral_history", "id", ("new_user_id", "referrer_id")):
+                pairs.extend((row["new_user_id"], row["referrer_id"]) for row in page)
+            self.referrers.load(pairs)
+            log.info("referrer_index_loaded", referrals=len(pairs))
         except Exception as e:
-            print(f"❌ Referral error: {e}")
-        return False
+            log.warning("referrer_index_load_failed", error=str(e))
 
     async def add_referral_commission(self, new_user_id: int, reward: float) -> None:
         """Add 5% commission to referrer from user's ad earnings"""
         try:
-            response = self.client.table("referral_history").select("referrer_id").eq("new_user_id", new_user_id).execute()
-            if response.data:
-                referrer_id = response.data[0]["referrer_id"]
-                commission = reward * 0.05
-                await self.add_balance(referrer_id, commission)
-                print(f"🤝 COMMISSION: {new_user_id} earned {reward} → {referrer_id} gets {commission:.2f} Rs")
+            referrer_id = await self.get_referrer_id(new_user_id)
+            if referrer_id:
+                commission = reward * COMMISSION_RATE
+                await self.add_balance_deferred(referrer_id, commission)
+                log.info("commission", user_id=new_user_id, reward=reward, referrer_id=referrer_id, commission=commission)
         except Exception as e:
-            print(f"⚠️ Commission error: {e}")
+            log.warning("commission_failed", user_id=new_user_id, error=str(e))
 
     # ============================================
     # WITHDRAWAL
@@ -176,6 +410,9 @@ class SupabaseDB:
             return {"can": False, "reason": "User not found"}
 
         balance = float(user.get("balance", 0))
+        if self.balance_buffer:
+            # Same balance the user was shown - write-behind credits count too
+            balance += self.balance_buffer.pending_for(user_id)
         referrals = int(user.get("referrals", 0))
 
         if balance < 380:
@@ -189,78 +426,192 @@ class SupabaseDB:
     # USER MANAGEMENT (ADMIN)
     # ============================================
 
+    async def scan_table(self, table: str, key: str, columns: tuple, where=None, page_size: int = None,
+                         start_after=None):
+        """Keyset-paginated scan: WHERE key > last ORDER BY key LIMIT page_size
+
+        Async generator of row pages. Each page costs the same on the
+        database no matter how deep the scan is, and rows inserted or deleted
+        mid-scan never shift the pages (unlike offset paging). `where` can add
+        filters to each page query and start_after resumes a scan from a
+        known key. Logs timings when the scan finishes.
+        """
+        page_size = page_size or SCAN_PAGE_SIZE
+        if key not in columns:
+            columns = (key,) + tuple(columns)
+        started = time.perf_counter()
+        pages = rows = 0
+        last = start_after
+        while True:
+            query = self.client.table(table).select(*columns)
+            if where:
+                query = where(query)
+            if last is not None:
+                query = query.gt(key, last)
+            response = await self._execute(query.order(key).limit(page_size))
+            if not response.data:
+                break
+            pages += 1
+            rows += len(response.data)
+            last = response.data[-1][key]
+            yield response.data
+            if len(response.data) < page_size:
+                break
+        log.info("table_scan", table=table, rows=rows, pages=pages, page_size=page_size,
+                 latency_ms=elapsed_ms(started))
+
+    async def iter_user_ids(self, active_days: int = None, page_size: int = None,
+                            start_after: int = None, active_since: str = None):
+        """Stream user ids page by page as compact array('q') buffers
+
+        Ids come in increasing order, starting after start_after if given.
+        The next page is fetched while the caller works on the current one,
+        so consumers start immediately and memory stays at ~2 pages.
+        """
+        if active_days is not None:
+            active_since = (date.today() - timedelta(days=active_days)).isoformat()
+        where = None
+        if active_since is not None:
+            where = lambda q: q.gte("created_at", active_since)
+
+        pages = self.scan_table("users", "user_id", ("user_id",), where=where, page_size=page_size,
+                                start_after=start_after)
+        next_page = asyncio.ensure_future(pages.__anext__())
+        try:
+            while True:
+                try:
+                    page = await next_page
+                except StopAsyncIteration:
+                    break
+                next_page = asyncio.ensure_future(pages.__anext__())
+                yield array("q", (row["user_id"] for row in page))
+        finally:
+            if not next_page.done():
+                next_page.cancel()
+            try:
+                await next_page
+            except (asyncio.CancelledError, StopAsyncIteration):
+                pass
+            await pages.aclose()
+
     async def get_active_users(self) -> list:
         """Get users active in last 30 days"""
         try:
             all_users = []
-            batch_size = 500
-            offset = 0
             thirty_days_ago = (date.today() - timedelta(days=30)).isoformat()
             
-            while True:
-                response = self.client.table("users").select("user_id").gte("created_at", thirty_days_ago).range(offset, offset + batch_size - 1).execute()
-                if not response.data:
-                    break
-                all_users.extend([user["user_id"] for user in response.data])
-                offset += batch_size
+            async for page in self.scan_table("users", "user_id", ("user_id",),
+                                              where=lambda q: q.gte("created_at", thirty_days_ago)):
+                all_users.extend(user["user_id"] for user in page)
             
-            print(f"✅ Active users: {len(all_users)}")
+            log.info("active_users", users=len(all_users))
             return all_users
         except Exception as e:
-            print(f"❌ Error: {e}")
+            log.error("active_users_failed", error=str(e))
             return []
 
     async def get_all_user_ids(self) -> list:
         """Get all user IDs"""
         try:
             all_users = []
-            batch_size = 500
-            offset = 0
             
-            while True:
-                response = self.client.table("users").select("user_id").range(offset, offset + batch_size - 1).execute()
-                if not response.data:
-                    break
-                all_users.extend([user["user_id"] for user in response.data])
-                offset += batch_size
+            async for page in self.scan_table("users", "user_id", ("user_id",)):
+                all_users.extend(user["user_id"] for user in page)
             
-            print(f"✅ Total users: {len(all_users)}")
+            log.info("all_users", users=len(all_users))
             return all_users
         except Exception as e:
-            print(f"❌ Error: {e}")
+            log.error("all_users_failed", error=str(e))
             return []
 
     async def delete_user(self, user_id: int) -> bool:
         """Delete user (total_users count stays same for trust)"""
         try:
-            self.client.table("users").delete().eq("user_id", user_id).execute()
-            self.client.table("referral_history").delete().eq("new_user_id", user_id).execute()
-            self.client.table("referral_history").delete().eq("referrer_id", user_id).execute()
-            print(f"🧹 DELETED user {user_id} (total_users count unchanged)")
+            await self._execute(self.client.table("users").delete().eq("user_id", user_id))
+            self.user_cache.invalidate(user_id)
+            await self._execute(self.client.table("referral_history").delete().eq("new_user_id", user_id))
+            await self._execute(self.client.table("referral_history").delete().eq("referrer_id", user_id))
+            self.referrers.remove_user(user_id)
+            log.info("user_deleted", user_id=user_id)
             return True
         except:
             return False
 
+    async def count_users(self, active_days: int = None) -> int:
+        """Count users server-side (exact count header, one row transferred)"""
+        try:
+            query = self.client.table("users").select("user_id", count="exact")
+            if active_days is not None:
+                since = (date.today() - timedelta(days=active_days)).isoformat()
+                query = query.gte("created_at", since)
+            response = await self._execute(query.limit(1))
+            return int(response.count or 0)
+        except Exception as e:
+            log.error("count_users_failed", error=str(e))
+            return 0
+
+    async def delete_users_bulk(self, user_ids, chunk_size: int = 200, concurrency: int = 4,
+                                on_progress=None) -> list:
+        """Delete many users with in_ filters - 3 DELETEs per chunk, chunks in parallel
+
+        on_progress(done, total, deleted) is awaited after every chunk.
+        Returns the ids that were actually deleted from users.
+        """
+        user_ids = list(user_ids)
+        chunks = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+        total = len(user_ids)
+        deleted = []
+        done = 0
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def delete_chunk(chunk):
+            nonlocal done
+            async with semaphore:
+                try:
+                    response = await self._execute(self.client.table("users").delete().in_("user_id", chunk))
+                    # Gone from users even if the referral_history DELETEs below fail
+                    deleted.extend(row["user_id"] for row in response.data)
+                    await self._execute(self.client.table("referral_history").delete().in_("new_user_id", chunk))
+                    await self._execute(self.client.table("referral_history").delete().in_("referrer_id", chunk))
+                except Exception as e:
+                    log.error("bulk_delete_failed", users=len(chunk), error=str(e))
+                finally:
+                    for user_id in chunk:
+                        self.user_cache.invalidate(user_id)
+                done += len(chunk)
+                if on_progress:
+                    await on_progress(done, total, len(deleted))
+
+        await asyncio.gather(*(delete_chunk(chunk) for chunk in chunks))
+        self.referrers.remove_users(deleted)
+
+        elapsed = time.perf_counter() - started
+        rate = total / elapsed if elapsed else 0.0
+        log.info("bulk_deleted", deleted=len(deleted), total=total, rate=round(rate), latency_ms=elapsed_ms(started))
+        return deleted
+
     async def get_global_stats(self) -> dict:
-        """Get global bot stats"""
+        """Get global bot stats - aggregated server-side (users_balance_total)"""
         try:
-            all_users = []
-            batch_size = 500
-            offset = 0
+            response = await self._execute(self.client.rpc("users_balance_total", {}))
+            if response.data:
+                row = response.data[0]
+                return {"total_users": int(row["total_users"]), "total_balance": float(row["total_balance"])}
+        except Exception as e:
+            log.warning("users_balance_total_unavailable", error=str(e))
+
+        try:
+            total_users = 0
             total_balance = 0.0
             
-            while True:
-                response = self.client.table("users").select("balance").range(offset, offset + batch_size - 1).execute()
-                if not response.data:
-                    break
-                all_users.extend(response.data)
-                total_balance += sum(float(user["balance"]) for user in response.data)
-                offset += batch_size
+            async for page in self.scan_table("users", "user_id", ("balance",)):
+                total_users += len(page)
+                total_balance += sum(float(user["balance"] or 0) for user in page)
             
-            total_users = len(all_users)
             return {"total_users": total_users, "total_balance": total_balance}
         except Exception as e:
-            print(f"❌ Error: {e}")
+            log.error("global_stats_failed", error=str(e))
             return {"total_users": 0, "total_balance": 0.0}
 
     async def get_user_stats(self, user_id: int) -> dict:
@@ -287,12 +638,12 @@ class SupabaseDB:
     async def get_total_user_count(self) -> int:
         """Get total user count from stats table - INSTANT"""
         try:
-            response = self.client.table("bot_stats").select("total_users").eq("id", 1).execute()
+            response = await self._execute(self.client.table("bot_stats").select("total_users").eq("id", 1))
             if response.data:
                 return int(response.data[0]["total_users"])
             return 0
         except Exception as e:
-            print(f"⚠️ Stats error: {e}")
+            log.warning("bot_stats_failed", error=str(e))
             return 0
 
     # ============================================
@@ -303,12 +654,12 @@ class SupabaseDB:
         """Get user's daily task progress"""
         try:
             today = date.today().isoformat()
-            response = self.client.table("daily_tasks").select("*").eq("user_id", user_id).eq("task_date", today).execute()
+            response = await self._execute(self.client.table("daily_tasks").select("*").eq("user_id", user_id).eq("task_date", today))
             if response.data:
                 return response.data[0]
             return None
         except Exception as e:
-            print(f"⚠️ Task fetch error: {e}")
+            log.warning("daily_tasks_fetch_failed", user_id=user_id, error=str(e))
             return None
 
     async def create_or_update_daily_task(self, user_id: int, tasks_completed: int = 0, pending_reward: float = 0):
@@ -317,22 +668,22 @@ class SupabaseDB:
             today = date.today().isoformat()
             
             # UPSERT: Update if exists, Insert if not (no duplicate key errors)
-            self.client.table("daily_tasks").upsert({
+            await self._execute(self.client.table("daily_tasks").upsert({
                 "user_id": user_id,
                 "task_date": today,
                 "tasks_completed": tasks_completed,
                 "pending_reward": pending_reward,
                 "last_task_time": datetime.now().isoformat()
-            }).execute()
-            print(f"📋 Tasks for {user_id}: {tasks_completed}/4 complete, {pending_reward} Rs pending")
+            }))
+            log.info("daily_tasks_updated", user_id=user_id, tasks_completed=tasks_completed, pending_reward=pending_reward)
         except Exception as e:
-            print(f"❌ Task update error: {e}")
+            log.error("daily_tasks_update_failed", user_id=user_id, error=str(e))
 
     async def check_task_code(self, code: str, user_id: int) -> dict:
         """Verify task code - per-user one-time use"""
         try:
             today = date.today().isoformat()
-            response = self.client.table("daily_task_codes").select("*").eq("secret_code", code).eq("created_date", today).execute()
+            response = await self._execute(self.client.table("daily_task_codes").select("*").eq("secret_code", code).eq("created_date", today))
             
             if not response.data:
                 return {"valid": False, "reason": "Code not found"}
@@ -341,7 +692,7 @@ class SupabaseDB:
             code_id = code_data["id"]
             
             # Check if THIS USER already used THIS CODE
-            usage_response = self.client.table("task_code_usage").select("id").eq("code_id", code_id).eq("user_id", user_id).execute()
+            usage_response = await self._execute(self.client.table("task_code_usage").select("id").eq("code_id", code_id).eq("user_id", user_id))
             
             if usage_response.data:
                 return {"valid": False, "reason": "You already used this code"}
@@ -352,20 +703,20 @@ class SupabaseDB:
                 "code_id": code_id
             }
         except Exception as e:
-            print(f"⚠️ Code check error: {e}")
+            log.warning("task_code_check_failed", user_id=user_id, error=str(e))
             return {"valid": False, "reason": "Error checking code"}
 
     async def mark_code_used(self, code_id: int, user_id: int):
         """Mark code as used by this specific user"""
         try:
-            self.client.table("task_code_usage").insert({
+            await self._execute(self.client.table("task_code_usage").insert({
                 "code_id": code_id,
                 "user_id": user_id,
                 "used_date": datetime.now().isoformat()
-            }).execute()
-            print(f"✅ Code {code_id} marked used by user {user_id}")
+            }))
+            log.info("task_code_used", code_id=code_id, user_id=user_id)
         except Exception as e:
-            print(f"⚠️ Mark code error: {e}")
+            log.warning("task_code_mark_failed", code_id=code_id, user_id=user_id, error=str(e))
 
     async def generate_daily_codes(self):
         """Generate 3 daily codes for admin (call once per day)"""
@@ -376,13 +727,13 @@ class SupabaseDB:
             today = date.today().isoformat()
             
             # Check if already generated
-            response = self.client.table("daily_task_codes").select("id").eq("created_date", today).execute()
+            response = await self._execute(self.client.table("daily_task_codes").select("id").eq("created_date", today))
             if response.data and len(response.data) >= 3:
-                print("✅ Codes already generated for today")
+                log.info("daily_codes_exist")
                 return
             
             # Delete old codes (older than today)
-            self.client.table("daily_task_codes").delete().lt("created_date", today).execute()
+            await self._execute(self.client.table("daily_task_codes").delete().lt("created_date", today))
             
             # Generate 3 unique codes
             codes = []
@@ -391,23 +742,26 @@ class SupabaseDB:
                 codes.append({"task_number": task_num, "secret_code": code, "created_date": today})
             
             # Insert codes
-            self.client.table("daily_task_codes").insert(codes).execute()
-            print(f"📋 Generated 3 daily codes: {[c['secret_code'] for c in codes]}")
+            await self._execute(self.client.table("daily_task_codes").insert(codes))
+            log.info("daily_codes_generated", codes=[c["secret_code"] for c in codes])
             
             return codes
         except Exception as e:
-            print(f"❌ Code generation error: {e}")
+            log.error("daily_codes_failed", error=str(e))
             return []
 
     async def get_daily_codes(self) -> list:
         """Get today's codes for admin"""
         try:
             today = date.today().isoformat()
-            response = self.client.table("daily_task_codes").select("*").eq("created_date", today).order("task_number").execute()
+            response = await self._execute(self.client.table("daily_task_codes").select("*").eq("created_date", today).order("task_number"))
             return response.data if response.data else []
         except Exception as e:
-            print(f"⚠️ Get codes error: {e}")
+            log.warning("daily_codes_fetch_failed", error=str(e))
             return []
 
+# Latency/error histograms per method (utils/metrics.py)
+instrument_class(SupabaseDB)
+
 # Initialize database
 db = SupabaseDB()
@@ -0,0 +1,127 @@
+import time
+import asyncio
+from functools import wraps
+from contextlib import asynccontextmanager
+from telegram.ext import SimpleUpdateProcessor
+
+
+class KeyedLocks:
+    """One asyncio.Lock per key, alive only while someone holds or waits for it
+
+    Lets concurrent updates of different users run in parallel while two
+    updates of the same user run one after the other. A lock is dropped as
+    soon as its last holder/waiter leaves, so the table never grows past the
+    number of users with an update in flight. Beyond `max_keys` new keys
+    share one of `stripes` fixed locks picked by hash(key) - never unlocked,
+    only less parallel (counted in `overflows`).
+
+    Wait times are kept for the metrics: how often a holder had to queue
+    behind an earlier update of the same key and for how long.
+    """
+
+    def __init__(self, max_keys: int = 100000, stripes: int = 256):
+        self.max_keys = max_keys
+        self.acquired = 0
+        self.contended = 0
+        self.overflows = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._locks = {}  # key -> [lock, holders + waiters]
+        self._stripes = [asyncio.Lock() for _ in range(stripes)]
+        self._striped = {}  # key -> holders + waiters on its stripe
+
+    def __len__(self):
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, key):
+        entry = self._locks.get(key)
+        if entry is None and (key in self._striped or len(self._locks) >= self.max_keys):
+            # Stay on the stripe while any update of this key is on it - keeps the order
+            self.overflows += 1
+            self._striped[key] = self._striped.get(key, 0) + 1
+            try:
+                async with self._acquire(self._stripes[hash(key) % len(self._stripes)]):
+                    yield
+            finally:
+                self._striped[key] -= 1
+                if self._striped[key] == 0:
+                    del self._striped[key]
+            return
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with self._acquire(entry[0]):
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    @asynccontextmanager
+    async def _acquire(self, lock):
+        if lock.locked():
+            self.contended += 1
+            started = time.monotonic()
+            await lock.acquire()
+            waited = time.monotonic() - started
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+        else:
+            await lock.acquire()
+        self.acquired += 1
+        try:
+            yield
+        finally:
+            lock.release()
+
+    def stats(self) -> dict:
+        return {
+            "active": len(self._locks),
+            "acquired": self.acquired,
+            "contended": self.contended,
+            "overflows": self.overflows,
+            "wait_total": self.wait_total,
+            "wait_avg": self.wait_total / self.contended if self.contended else 0.0,
+            "wait_max": self.wait_max
+        }
+
+
+user_locks = KeyedLocks()
+
+
+class PerUserUpdateProcessor(SimpleUpdateProcessor):
+    """Concurrent updates, but each user's updates one at a time in arrival order
+
+    Application starts update tasks in arrival order and both the semaphore
+    and the per-key locks are FIFO, so an update waits for the earlier ones
+    of its user. Uses its own KeyedLocks - per_user handlers take user_locks
+    inside it.
+    """
+
+    __slots__ = ("locks",)
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self.locks = KeyedLocks()
+
+    async def do_process_update(self, update, coroutine) -> None:
+        user = getattr(update, "effective_user", None)
+        if user is None:
+            await coroutine
+            return
+        async with self.locks.hold(user.id):
+            await coroutine
+
+
+def per_user(handler):
+    """Run a handler under its user's lock (balance-mutating handlers)"""
+    @wraps(handler)
+    async def wrapper(update, context):
+        user = update.effective_user
+        if user is None:
+            return await handler(update, context)
+        async with user_locks.hold(user.id):
+            return await handler(update, context)
+    return wrapper
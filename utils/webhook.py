@@ -0,0 +1,183 @@
+import ssl
+import hmac
+import json
+import asyncio
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+MAX_BODY = 1024 * 1024
+MAX_HEADERS = 100
+IDLE_TIMEOUT = 75.0    # keep-alive connection waiting for its next request
+HEADER_TIMEOUT = 10.0  # request line + headers, once the request has started
+BODY_TIMEOUT = 30.0
+
+REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+           405: "Method Not Allowed", 413: "Payload Too Large"}
+
+
+class MalformedRequest(ValueError):
+    """The request cannot be parsed - answer 400 and close the connection"""
+
+
+async def _read_head(reader, first_line: bytes):
+    try:
+        method, path, _ = first_line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise MalformedRequest("bad request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, sep, value = line.decode("latin-1").partition(":")
+        if not sep or len(headers) >= MAX_HEADERS:
+            raise MalformedRequest("bad header")
+        headers[name.strip().lower()] = value.strip()
+    return method, path, headers
+
+
+async def read_request(reader, idle_timeout: float = IDLE_TIMEOUT):
+    """Read one HTTP/1.1 request -> (method, path, headers, body), None on EOF
+
+    Also None when no request starts within idle_timeout. Raises
+    MalformedRequest for an unparsable request (overlong lines, a bad
+    Content-Length) and TimeoutError when the headers or body are too slow.
+    The body is None when Content-Length is over MAX_BODY; it is left unread.
+    """
+    try:
+        line = await asyncio.wait_for(reader.readline(), idle_timeout)
+    except TimeoutError:
+        return None
+    except ValueError:
+        # Longer than the stream limit (LimitOverrunError surfaces as ValueError)
+        raise MalformedRequest("request line too long")
+    if not line:
+        return None
+    try:
+        method, path, headers = await asyncio.wait_for(_read_head(reader, line), HEADER_TIMEOUT)
+    except MalformedRequest:
+        raise
+    except ValueError:
+        raise MalformedRequest("header line too long")
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise MalformedRequest("bad content-length")
+    if length < 0:
+        raise MalformedRequest("bad content-length")
+    if length > MAX_BODY:
+        return method, path, headers, None
+    body = await asyncio.wait_for(reader.readexactly(length), BODY_TIMEOUT) if length else b""
+    return method, path, headers, body
+
+
+def make_ssl_context(cert_path: str, key_path: str = None) -> ssl.SSLContext:
+    """Server-side TLS context from a PEM certificate (chain) and private key"""
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert_path, key_path)
+    return context
+
+
+def write_response(writer, status: int, body: bytes = b"", content_type: str = "text/plain",
+                   keep_alive: bool = True) -> None:
+    writer.write(
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body
+    )
+
+
+class WebhookServer:
+    """Minimal HTTP endpoint for Telegram webhook updates
+
+    Runs on the bot's own event loop (asyncio.start_server, no extra
+    dependencies). Every POST to `url_path` must carry the secret token
+    given to setWebhook in the X-Telegram-Bot-Api-Secret-Token header;
+    anything else is rejected before the body is parsed. Valid updates
+    are handed to `on_update(data)` and acknowledged with 200 - Telegram
+    keeps an update queued until it gets one, so nothing is lost while
+    the bot restarts.
+
+    Telegram only delivers to HTTPS: pass an ssl.SSLContext (see
+    make_ssl_context) or run plain HTTP behind a TLS-terminating reverse proxy.
+
+    Connections are kept alive, Telegram opens up to max_connections of them.
+    Idle or stalled connections are dropped (see read_request timeouts) and a
+    malformed request gets 400 and a closed connection.
+    """
+
+    def __init__(self, on_update, secret_token: str, url_path: str = "/telegram",
+                 listen: str = "0.0.0.0", port: int = 8443, ssl_context: ssl.SSLContext = None):
+        self.on_update = on_update
+        self.secret_token = secret_token
+        self.url_path = url_path
+        self.listen = listen
+        self.port = port
+        self.ssl_context = ssl_context
+        self.received = 0
+        self.rejected = 0
+        self._server = None
+        self._writers = set()
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.listen, self.port, ssl=self.ssl_context)
+        # port=0 picks a free port (tests)
+        self.port = self._server.sockets[0].getsockname()[1]
+        log.info("webhook_listening", listen=self.listen, port=self.port, path=self.url_path,
+                 tls=self.ssl_context is not None)
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            # Idle keep-alive connections would hold wait_closed() forever
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader, writer):
+        self._writers.add(writer)
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except MalformedRequest:
+                    write_response(writer, 400, keep_alive=False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                status = await self._dispatch(*request)
+                # An oversized body was not read - the connection cannot be reused
+                keep_alive = request[3] is not None and request[2].get("connection", "").lower() != "close"
+                write_response(writer, status, keep_alive=keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, TimeoutError, ssl.SSLError):
+            # Client went away or stalled mid-request
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _dispatch(self, method, path, headers, body) -> int:
+        if path.split("?", 1)[0] != self.url_path:
+            return 404
+        if method != "POST":
+            return 405
+        if not hmac.compare_digest(headers.get(SECRET_HEADER, "").encode(), self.secret_token.encode()):
+            self.rejected += 1
+            return 403
+        if body is None:
+            return 413
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return 400
+        self.received += 1
+        await self.on_update(data)
+        return 200